@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+MaarifPlanner auth micro-benchmark
+Per-request cost of resolving a bearer token to a user, with and without the decoded-token cache
+"""
+
+import os
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+
+from bson import ObjectId
+
+from auth_tokens import TokenVerifier, create_token, decode_token, principal_from_claims
+
+SECRET = "benchmark-secret-with-a-realistic-32-byte-length"
+ROUNDS = int(os.environ.get("AUTH_BENCH_ROUNDS", "20000"))
+
+
+def main():
+    user = {
+        "_id": ObjectId(),
+        "email": "ayse.ogretmen@okul.edu.tr",
+        "name": "Ayşe Yılmaz",
+        "school": "Atatürk Anaokulu",
+        "className": "Papatyalar",
+        "ageDefault": "60_72",
+        "tokenVersion": 0
+    }
+    token = create_token(user, SECRET, with_claims=True)
+    verifier = TokenVerifier(SECRET)
+
+    cases = [
+        ("jwt.decode", lambda: principal_from_claims(decode_token(token, SECRET))),
+        ("TokenVerifier", lambda: principal_from_claims(verifier.decode(token)))
+    ]
+    results = {}
+    print(f"Token: {len(token)} bytes, {ROUNDS} requests per run, best of 5")
+    for name, case in cases:
+        seconds = min(timeit.repeat(case, number=ROUNDS, repeat=5))
+        results[name] = 1e6 * seconds / ROUNDS
+        print(f"{name:<14} {results[name]:8.2f} µs/request")
+    print(f"Speedup: {results['jwt.decode'] / results['TokenVerifier']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
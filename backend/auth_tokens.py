@@ -0,0 +1,142 @@
+"""JWT issuing and verification, with optional self-contained user claims and version-based revocation."""
+
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+import jwt
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Bump when the claims snapshot changes shape; older tokens fall back to a database lookup
+CLAIMS_VERSION = 1
+CLAIM_FIELDS = ("email", "name", "school", "className", "ageDefault")
+
+
+def create_token(user: Dict[str, Any], secret: str, with_claims: bool = False,
+                 lifetime: timedelta = timedelta(days=7)) -> str:
+    payload = {
+        "user_id": str(user["_id"]),
+        "tv": user.get("tokenVersion", 0),
+        "exp": datetime.utcnow() + lifetime
+    }
+    if with_claims:
+        payload["claims"] = {"v": CLAIMS_VERSION, **{field: user.get(field) for field in CLAIM_FIELDS}}
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+def decode_token(token: str, secret: str) -> Dict[str, Any]:
+    return jwt.decode(token, secret, algorithms=["HS256"])
+
+
+class TokenVerifier:
+    """HS256 verification with a cache of decoded payloads keyed by the token's digest.
+
+    A busy client sends the same token for days, so repeat requests skip the
+    base64, JSON and HMAC work. Entries never outlive the token's `exp` (or
+    `max_ttl`), and only digests are kept, never the bearer tokens themselves.
+    Cached payloads are shared and must not be mutated.
+    """
+
+    def __init__(self, secret: str, maxsize: int = 10000, max_ttl: float = 3600):
+        self.secret = secret
+        self.max_ttl = max_ttl
+        self.cache = TTLCache(maxsize=maxsize, ttl=max_ttl)
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        key = hashlib.sha256(token.encode()).digest()
+        payload = self.cache.get(key)
+        if payload is not None:
+            return payload
+        payload = decode_token(token, self.secret)
+        ttl = min(self.max_ttl, payload.get("exp", 0) - time.time())
+        if ttl > 0:
+            self.cache.set(key, payload, ttl=ttl)
+        return payload
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+
+def principal_from_claims(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The user dict handlers expect, rebuilt from a claims token without touching the database."""
+    claims = payload.get("claims")
+    if not isinstance(claims, dict) or claims.get("v") != CLAIMS_VERSION:
+        return None
+    return {
+        "_id": ObjectId(payload["user_id"]),
+        **{field: claims[field] for field in CLAIM_FIELDS if claims.get(field) is not None}
+    }
+
+
+class TokenRevocations:
+    """Per-user minimum token version, kept in memory.
+
+    Logout and password changes increment the user's `tokenVersion`, which
+    invalidates every token issued before. Only users who ever revoked are
+    tracked, and changes made by other instances are picked up by polling
+    `tokenVersionUpdatedAt` every `refresh_interval` seconds.
+    """
+
+    def __init__(self, collection, refresh_interval: float = 15.0):
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self._versions: Dict[str, int] = {}
+        self._synced_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.rejected = 0
+
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        if payload.get("tv", 0) < self._versions.get(payload["user_id"], 0):
+            self.rejected += 1
+            return True
+        return False
+
+    async def revoke(self, user_id: str) -> int:
+        """Invalidate all of the user's current tokens; returns the new version."""
+        user = await self.collection.find_one_and_update(
+            {"_id": ObjectId(user_id)},
+            {"$inc": {"tokenVersion": 1}, "$set": {"tokenVersionUpdatedAt": datetime.utcnow()}},
+            projection={"tokenVersion": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        self._versions[user_id] = user["tokenVersion"]
+        return user["tokenVersion"]
+
+    async def refresh(self):
+        query: Dict[str, Any] = {"tokenVersion": {"$gt": 0}}
+        now = datetime.utcnow()
+        if self._synced_at is not None:
+            # Small overlap so updates racing the previous poll are not missed
+            query["tokenVersionUpdatedAt"] = {"$gte": self._synced_at - timedelta(seconds=5)}
+        async for user in self.collection.find(query, {"tokenVersion": 1}):
+            user_id = str(user["_id"])
+            self._versions[user_id] = max(self._versions.get(user_id, 0), user["tokenVersion"])
+        self._synced_at = now
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Token revocation refresh failed: {str(e)}")
+
+    async def start(self):
+        await self.refresh()
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"trackedUsers": len(self._versions), "rejected": self.rejected}
@@ -0,0 +1,81 @@
+"""Server-side chat sessions rebuilt from stored chat_history turns."""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+
+from ttl_cache import TTLCache
+
+
+class ChatSessionStore:
+    """Tracks session metadata in `sessions` and replays turns from `history`.
+
+    Active sessions are held in an LRU cache so a follow-up message costs no
+    database reads; evicted sessions are reloaded from the last `max_turns`
+    exchanges in chat_history.
+    """
+
+    def __init__(self, sessions, history, maxsize: int = 2000, ttl: int = 3600, max_turns: int = 20):
+        self.sessions = sessions
+        self.history = history
+        self.max_turns = max_turns
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def create(self, user_id: str, age_band: str, plan_type: str) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        result = await self.sessions.insert_one({
+            "userId": ObjectId(user_id),
+            "ageBand": age_band,
+            "planType": plan_type,
+            "createdAt": now,
+            "updatedAt": now
+        })
+        session = {
+            "id": str(result.inserted_id),
+            "userId": user_id,
+            "ageBand": age_band,
+            "planType": plan_type,
+            "turns": []
+        }
+        self.cache.set(session["id"], session)
+        return session
+
+    async def get(self, session_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        session = self.cache.get(session_id)
+        if session is None:
+            session = await self._load(session_id)
+            if session is None:
+                return None
+            self.cache.set(session_id, session)
+        return session if session["userId"] == user_id else None
+
+    async def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        doc = await self.sessions.find_one({"_id": ObjectId(session_id)})
+        if doc is None:
+            return None
+        records = await self.history.find({"sessionId": doc["_id"]}).sort("timestamp", -1).to_list(self.max_turns)
+        turns = []
+        for record in reversed(records):
+            turns.append(("user", record["message"]))
+            turns.append(("assistant", json.dumps(record["response"], ensure_ascii=False)))
+        return {
+            "id": session_id,
+            "userId": str(doc["userId"]),
+            "ageBand": doc["ageBand"],
+            "planType": doc["planType"],
+            "turns": turns
+        }
+
+    async def append(self, session: Dict[str, Any], message: str, response: Dict[str, Any]):
+        session["turns"].append(("user", message))
+        session["turns"].append(("assistant", json.dumps(response, ensure_ascii=False)))
+        del session["turns"][:-2 * self.max_turns]
+        await self.sessions.update_one(
+            {"_id": ObjectId(session["id"])},
+            {"$set": {"updatedAt": datetime.utcnow()}}
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
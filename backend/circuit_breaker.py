@@ -0,0 +1,120 @@
+"""Circuit breaker for LLM calls: trips on error rate or slow calls, probes recovery half-open."""
+
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Tuple
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the provider while the circuit is open."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("LLM service is temporarily unavailable")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed, open and half-open states over a sliding window of recent calls.
+
+    Once the window holds `min_calls` outcomes, the circuit opens when the
+    failure ratio reaches `failure_ratio` or the share of calls slower than
+    `slow_call_seconds` reaches `slow_ratio`. While open every call fails
+    immediately. After `open_seconds`, up to `half_open_trials` calls are let
+    through; if all of them succeed the circuit closes, and any failure opens
+    it again.
+    """
+
+    def __init__(self, window: int = 50, min_calls: int = 10, failure_ratio: float = 0.5,
+                 slow_call_seconds: float = 60.0, slow_ratio: float = 0.8, open_seconds: float = 30.0,
+                 half_open_trials: int = 3):
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_ratio = slow_ratio
+        self.open_seconds = open_seconds
+        self.half_open_trials = half_open_trials
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window)
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self.opened = 0
+        self.rejected = 0
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._opened_at + self.open_seconds - time.monotonic()))
+
+    def check(self):
+        """Fail fast without reserving a trial, e.g. before queueing for admission."""
+        if self.state == "open" and time.monotonic() - self._opened_at < self.open_seconds:
+            self.rejected += 1
+            raise CircuitOpen(self.retry_after())
+
+    def _allow(self) -> bool:
+        self.check()
+        if self.state == "open":
+            self.state = "half_open"
+            self._trials = self._trial_successes = 0
+        if self.state == "half_open":
+            if self._trials >= self.half_open_trials:
+                self.rejected += 1
+                raise CircuitOpen(1)
+            self._trials += 1
+            return True
+        return False
+
+    def _trip(self):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.opened += 1
+
+    def _record(self, trial: bool, seconds: float, failed: bool):
+        slow = seconds >= self.slow_call_seconds
+        if trial:
+            if self.state != "half_open":
+                return
+            if failed or slow:
+                self._trip()
+                return
+            self._trial_successes += 1
+            if self._trial_successes >= self.half_open_trials:
+                self.state = "closed"
+            return
+        if self.state != "closed":
+            return
+        self._outcomes.append((failed, slow))
+        if len(self._outcomes) < self.min_calls:
+            return
+        failures = sum(1 for failed, _ in self._outcomes if failed)
+        slow_calls = sum(1 for _, slow in self._outcomes if slow)
+        if failures >= self.failure_ratio * len(self._outcomes) or slow_calls >= self.slow_ratio * len(self._outcomes):
+            self._trip()
+
+    @contextmanager
+    def guard(self):
+        trial = self._allow()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self._record(trial, time.monotonic() - started, failed=True)
+            raise
+        except BaseException:
+            # Cancelled or abandoned: no verdict, just free the trial slot
+            if trial and self.state == "half_open":
+                self._trials -= 1
+            raise
+        self._record(trial, time.monotonic() - started, failed=False)
+
+    def stats(self) -> Dict[str, Any]:
+        window = len(self._outcomes)
+        return {
+            "state": self.state,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "windowCalls": window,
+            "failureRatio": round(sum(1 for failed, _ in self._outcomes if failed) / window, 4) if window else 0.0
+        }
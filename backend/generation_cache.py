@@ -0,0 +1,92 @@
+"""Two-tier cache for AI plan generations keyed on the normalized request."""
+
+import copy
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+def generation_key(message: str, history: List[Dict[str, str]], age_band: str, plan_type: str,
+                   date: str, user_age_band: str) -> str:
+    """Canonical hash of everything that shapes the model's answer.
+
+    `user_age_band` is the teacher's default band, which the system prompt
+    uses alongside the requested `age_band`.
+    """
+    canonical = {
+        "message": normalize_text(message),
+        "history": [[msg["role"], normalize_text(msg["content"])] for msg in history],
+        "ageBand": age_band,
+        "planType": plan_type,
+        "date": date,
+        "userAgeBand": user_age_band
+    }
+    encoded = json.dumps(canonical, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class GenerationCache:
+    """In-process LRU in front of a Mongo collection with a TTL index on `expiresAt`."""
+
+    def __init__(self, collection, maxsize: int = 1000, ttl: int = 86400):
+        self.collection = collection
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.mongo_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        response = self.memory.get(key)
+        if response is not None:
+            return copy.deepcopy(response)
+        try:
+            doc = await self.collection.find_one({"_id": key, "expiresAt": {"$gt": datetime.utcnow()}})
+        except Exception as e:
+            logger.warning(f"Generation cache lookup failed: {str(e)}")
+            doc = None
+        if doc is None:
+            self.misses += 1
+            return None
+        self.mongo_hits += 1
+        remaining = (doc["expiresAt"] - datetime.utcnow()).total_seconds()
+        self.memory.set(key, doc["response"], ttl=remaining)
+        return copy.deepcopy(doc["response"])
+
+    async def set(self, key: str, response: Dict[str, Any]):
+        self.memory.set(key, copy.deepcopy(response))
+        now = datetime.utcnow()
+        try:
+            await self.collection.replace_one(
+                {"_id": key},
+                {"response": response, "createdAt": now, "expiresAt": now + timedelta(seconds=self.ttl)},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Generation cache store failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory.stats()
+        lookups = memory["hits"] + self.mongo_hits + self.misses
+        return {
+            "memoryHits": memory["hits"],
+            "mongoHits": self.mongo_hits,
+            "misses": self.misses,
+            "hitRatio": round((memory["hits"] + self.mongo_hits) / lookups, 4) if lookups else 0.0,
+            "size": memory["size"],
+            "maxsize": memory["maxsize"],
+            "evictions": memory["evictions"]
+        }
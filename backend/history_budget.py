@@ -0,0 +1,81 @@
+"""Keep the conversation sent to the LLM under a token budget."""
+
+import json
+import math
+from typing import Any, Dict, List, Tuple
+
+# Turkish text with diacritics averages roughly three characters per token
+CHARS_PER_TOKEN = 3
+SUMMARY_TEXT_LIMIT = 200
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _parse_plan(content: str) -> Any:
+    if not content.lstrip().startswith("{"):
+        return None
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        return None
+
+
+def _summarize_plan(plan: Dict[str, Any]) -> str:
+    if not plan.get("finalize"):
+        questions = "; ".join(plan.get("followUpQuestions", []))
+        return f"[önceki yanıt: ek bilgi istendi] {questions}"[:SUMMARY_TEXT_LIMIT]
+    blocks = plan.get("blocks") if isinstance(plan.get("blocks"), dict) else {}
+    codes = ", ".join(
+        outcome.get("code", "") for outcome in plan.get("domainOutcomes", []) if isinstance(outcome, dict)
+    )
+    titles = ", ".join(
+        activity.get("title", "") for activity in blocks.get("activities", []) if isinstance(activity, dict)
+    )
+    return (
+        f"[önceki plan] tarih: {plan.get('date', '')}; yaş: {plan.get('ageBand', '')}; "
+        f"tema: {plan.get('theme', '')}; alanlar: {codes}; etkinlikler: {titles}"
+    )
+
+
+def summarize_turn(role: str, content: str) -> str:
+    """One-line stand-in for an older turn; full plan JSONs shrink to their outline."""
+    plan = _parse_plan(content)
+    if isinstance(plan, dict):
+        return f"{role}: {_summarize_plan(plan)}"
+    text = " ".join(content.split())
+    if len(text) > SUMMARY_TEXT_LIMIT:
+        text = text[:SUMMARY_TEXT_LIMIT] + "…"
+    return f"{role}: {text}"
+
+
+def compact_history(history: List[Tuple[str, str]], message: str, budget_tokens: int,
+                    verbatim_turns: int) -> str:
+    """Build the `role: content` transcript for the model.
+
+    The newest `verbatim_turns` turns are kept as-is, older turns are
+    summarized, and turns that no longer fit in `budget_tokens` are dropped
+    oldest first. The new user message is always included.
+    """
+    final_line = f"user: {message}"
+    remaining = budget_tokens - estimate_tokens(final_line)
+    kept = []
+    dropped = 0
+    for age, (role, content) in enumerate(reversed(history)):
+        line = f"{role}: {content}" if age < verbatim_turns else summarize_turn(role, content)
+        cost = estimate_tokens(line) + 1
+        if cost > remaining and age < verbatim_turns:
+            line = summarize_turn(role, content)
+            cost = estimate_tokens(line) + 1
+        if cost > remaining:
+            dropped = len(history) - age
+            break
+        kept.append(line)
+        remaining -= cost
+
+    lines = list(reversed(kept))
+    if dropped:
+        lines.insert(0, f"[{dropped} eski mesaj çıkarıldı]")
+    lines.append(final_line)
+    return "\n".join(lines)
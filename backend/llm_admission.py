@@ -0,0 +1,163 @@
+"""Admission control for LLM calls: global concurrency cap with fair queuing per school and user."""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """Raised when a caller cannot get an LLM slot within the allowed wait."""
+
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class LlmAdmission:
+    """Caps outstanding LLM calls at `max_concurrency`.
+
+    Waiters are queued per school and, inside a school, per user. Free slots
+    go round robin across schools (a school with weight N gets N grants per
+    turn) and round robin across that school's users, so one busy classroom
+    cannot starve everyone else. Callers that wait longer than `max_wait`
+    seconds, or arrive when `max_queue` callers are already waiting, are
+    rejected with a Retry-After estimate.
+    """
+
+    def __init__(self, max_concurrency: int = 16, max_wait: float = 15.0, max_queue: int = 500,
+                 school_weights: Optional[Dict[str, int]] = None):
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.school_weights = school_weights or {}
+        self._in_flight = 0
+        self._waiting = 0
+        self._queues: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {}
+        self._rotation: Deque[str] = deque()
+        self._credits: Dict[str, int] = {}
+        self._service_time = 10.0
+        self._waits: Deque[float] = deque(maxlen=500)
+        self.admitted = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+
+    @asynccontextmanager
+    async def slot(self, school: str, user: str):
+        await self.acquire(school, user)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            # Smoothed call duration feeds the Retry-After estimate
+            self._service_time = 0.9 * self._service_time + 0.1 * (time.monotonic() - started)
+            self.release()
+
+    async def acquire(self, school: str, user: str):
+        if self._in_flight < self.max_concurrency and not self._waiting:
+            self._in_flight += 1
+            self._record_wait(0.0)
+            return
+        if self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self.retry_after(), "LLM queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(school, user, future)
+        started = time.monotonic()
+        try:
+            await asyncio.wait({future}, timeout=self.max_wait)
+        except asyncio.CancelledError:
+            if future.done():
+                self.release()
+            else:
+                self._remove(school, user, future)
+            raise
+        if not future.done():
+            self._remove(school, user, future)
+            self.rejected += 1
+            raise AdmissionRejected(self.retry_after(), "Timed out waiting for an LLM slot")
+        self._record_wait(time.monotonic() - started)
+
+    def try_acquire(self) -> bool:
+        """Take a free slot without queueing; used for optional work such as hedged requests."""
+        if self._in_flight < self.max_concurrency and not self._waiting:
+            self._in_flight += 1
+            return True
+        return False
+
+    def release(self):
+        self._in_flight -= 1
+        while self._in_flight < self.max_concurrency and self._waiting:
+            future = self._next_waiter()
+            self._in_flight += 1
+            future.set_result(None)
+
+    def retry_after(self) -> int:
+        backlog = (self._waiting + 1) / self.max_concurrency
+        return max(1, math.ceil(backlog * self._service_time))
+
+    def _enqueue(self, school: str, user: str, future: asyncio.Future):
+        users = self._queues.get(school)
+        if users is None:
+            users = self._queues[school] = OrderedDict()
+            self._rotation.append(school)
+        users.setdefault(user, deque()).append(future)
+        self._waiting += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._waiting)
+
+    def _remove(self, school: str, user: str, future: asyncio.Future):
+        users = self._queues[school]
+        users[user].remove(future)
+        self._waiting -= 1
+        if not users[user]:
+            del users[user]
+        if not users:
+            self._drop_school(school)
+
+    def _drop_school(self, school: str):
+        del self._queues[school]
+        self._rotation.remove(school)
+        self._credits.pop(school, None)
+
+    def _next_waiter(self) -> asyncio.Future:
+        school = self._rotation[0]
+        users = self._queues[school]
+        if self._credits.get(school, 0) <= 0:
+            self._credits[school] = self.school_weights.get(school, 1)
+
+        user = next(iter(users))
+        waiters = users[user]
+        future = waiters.popleft()
+        self._waiting -= 1
+        if waiters:
+            users.move_to_end(user)
+        else:
+            del users[user]
+
+        self._credits[school] -= 1
+        if not users:
+            self._drop_school(school)
+        elif self._credits[school] <= 0:
+            self._rotation.rotate(-1)
+        return future
+
+    def _record_wait(self, seconds: float):
+        self.admitted += 1
+        self._waits.append(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        return {
+            "maxConcurrency": self.max_concurrency,
+            "inFlight": self._in_flight,
+            "queueDepth": self._waiting,
+            "maxQueueDepth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "waitMsAvg": round(1000 * sum(waits) / len(waits), 1) if waits else 0.0,
+            "waitMsP95": round(1000 * waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0.0
+        }
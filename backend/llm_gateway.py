@@ -0,0 +1,223 @@
+"""Single entry point for LLM calls: admission control in front of a pluggable provider."""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from circuit_breaker import CircuitBreaker
+from llm_providers import LlmProvider
+
+
+class LlmDeadlineExceeded(TimeoutError):
+    """Raised when an LLM call does not finish before its deadline."""
+
+
+class RetryBudget:
+    """Token bucket shared by every call: each call deposits `ratio`, each retry or hedge spends one.
+
+    Extra attempts are capped at roughly `ratio` of regular traffic, so a
+    provider incident cannot multiply the load we send it.
+    """
+
+    def __init__(self, ratio: float = 0.1, max_tokens: float = 20.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self.spent = 0
+        self.denied = 0
+
+    def deposit(self):
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self._tokens < 1:
+            self.denied += 1
+            return False
+        self._tokens -= 1
+        self.spent += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tokens": round(self._tokens, 2), "spent": self.spent, "denied": self.denied}
+
+
+class LlmGateway:
+    """Routes every completion through admission control to the configured provider.
+
+    Each call carries a deadline (admission wait included). If a completion
+    has not returned after the recent p95 latency, a hedged duplicate is sent
+    and the first reply wins; the loser is cancelled. The hedge takes its own
+    admission slot and is skipped when none is free, so the concurrency cap
+    counts every outstanding provider call. Failed attempts are retried while
+    time remains. Hedges and retries both draw on the shared retry budget.
+    Streams get the deadline but are never hedged or retried, since their
+    chunks are already on the way to the client. With a circuit breaker
+    configured, calls fail fast with `CircuitOpen` while the provider is
+    unhealthy instead of queueing for admission.
+    """
+
+    def __init__(self, provider: LlmProvider, admission=None, timeout: float = 90.0, hedge_min_delay: float = 2.0,
+                 retry_budget: Optional[RetryBudget] = None, max_attempts: int = 2,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.provider = provider
+        self.admission = admission
+        self.breaker = breaker
+        self.timeout = timeout
+        self.hedge_min_delay = hedge_min_delay
+        self.retry_budget = retry_budget or RetryBudget()
+        self.max_attempts = max_attempts
+        self._latencies: Deque[float] = deque(maxlen=200)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+        self.retries = 0
+        self.deadline_exceeded = 0
+
+    @asynccontextmanager
+    async def _admitted(self, tenant: Optional[Tuple[str, str]]):
+        if self.breaker is not None:
+            self.breaker.check()
+        if self.admission is None or tenant is None:
+            yield
+            return
+        async with self.admission.slot(*tenant):
+            yield
+
+    @contextmanager
+    def _guarded(self):
+        if self.breaker is None:
+            yield
+            return
+        with self.breaker.guard():
+            yield
+
+    def hedge_delay(self) -> float:
+        if len(self._latencies) < 20:
+            return max(self.hedge_min_delay, self.timeout / 2)
+        ordered = sorted(self._latencies)
+        return max(self.hedge_min_delay, ordered[int(0.95 * (len(ordered) - 1))])
+
+    def _remaining(self, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.deadline_exceeded += 1
+            raise LlmDeadlineExceeded("LLM call exceeded its deadline")
+        return remaining
+
+    async def _timed(self, text: str) -> str:
+        started = time.monotonic()
+        reply = await self.provider.complete(text)
+        self._latencies.append(time.monotonic() - started)
+        return reply
+
+    def _hedge_slot(self, tenant: Optional[Tuple[str, str]]) -> Optional[bool]:
+        """Whether the hedge holds its own admission slot, or None when it must be skipped.
+
+        A hedge never queues: with the concurrency cap reached it is dropped, so
+        outstanding provider calls stay within `max_concurrency`.
+        """
+        admitted = self.admission is not None and tenant is not None
+        if admitted and not self.admission.try_acquire():
+            self.hedges_skipped += 1
+            return None
+        if not self.retry_budget.try_spend():
+            if admitted:
+                self.admission.release()
+            return None
+        return admitted
+
+    async def _hedged(self, text: str, deadline: float, tenant: Optional[Tuple[str, str]] = None) -> str:
+        attempts = {asyncio.ensure_future(self._timed(text))}
+        primary = next(iter(attempts))
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=min(self.hedge_delay(), self._remaining(deadline)))
+            admitted = None if done else self._hedge_slot(tenant)
+            if admitted is not None:
+                self.hedges += 1
+                hedge = asyncio.ensure_future(self._timed(text))
+                if admitted:
+                    # Released on completion or cancellation, even if the task never got to run
+                    hedge.add_done_callback(lambda _: self.admission.release())
+                attempts.add(hedge)
+            while attempts:
+                done, attempts = await asyncio.wait(
+                    attempts, timeout=self._remaining(deadline), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                if not attempts:
+                    raise next(iter(done)).exception()
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    async def complete(self, text: str, tenant: Optional[Tuple[str, str]] = None,
+                       timeout: Optional[float] = None) -> str:
+        deadline = time.monotonic() + (timeout or self.timeout)
+        async with self._admitted(tenant):
+            self.calls += 1
+            self.retry_budget.deposit()
+            with self._guarded():
+                attempt = 1
+                while True:
+                    try:
+                        return await self._hedged(text, deadline, tenant)
+                    except LlmDeadlineExceeded:
+                        raise
+                    except Exception:
+                        if attempt >= self.max_attempts or not self.retry_budget.try_spend():
+                            raise
+                        self._remaining(deadline)
+                        attempt += 1
+                        self.retries += 1
+
+    async def stream(self, text: str, tenant: Optional[Tuple[str, str]] = None,
+                     timeout: Optional[float] = None) -> AsyncIterator[str]:
+        deadline = time.monotonic() + (timeout or self.timeout)
+        async with self._admitted(tenant):
+            self.calls += 1
+            self.retry_budget.deposit()
+            with self._guarded():
+                chunks = self.provider.stream(text).__aiter__()
+                try:
+                    while True:
+                        remaining = self._remaining(deadline)
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                        except StopAsyncIteration:
+                            return
+                        except asyncio.TimeoutError:
+                            self.deadline_exceeded += 1
+                            raise LlmDeadlineExceeded("LLM stream exceeded its deadline")
+                        yield chunk
+                finally:
+                    await chunks.aclose()
+
+    @property
+    def streams(self) -> bool:
+        return self.provider.streams
+
+    async def warm_up(self, ping: bool = False):
+        await self.provider.warm_up(ping)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.provider.name,
+            "streams": self.provider.streams,
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedgeWins": self.hedge_wins,
+            "hedgesSkipped": self.hedges_skipped,
+            "retries": self.retries,
+            "deadlineExceeded": self.deadline_exceeded,
+            "hedgeDelayMs": round(1000 * self.hedge_delay()),
+            "retryBudget": self.retry_budget.stats(),
+            "circuit": self.breaker.stats() if self.breaker is not None else None,
+            **self.provider.stats()
+        }
@@ -0,0 +1,246 @@
+"""LLM provider backends behind the gateway: the Emergent integration and an offline mock."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from plan_paths import get_path, parse_path
+from prompt_builder import EXAMPLE_PLAN_JSON
+
+logger = logging.getLogger(__name__)
+
+_NODE_PATH = re.compile(r"Yenilenecek bölüm \(([^)]+)\)")
+
+
+class LlmProvider(ABC):
+    """Interface every backend implements; `stream` yields text chunks of one completion.
+
+    `streams` is False for backends that can only return the whole reply at
+    once, in which case `stream` yields it as a single chunk.
+    """
+
+    name = "base"
+    streams = False
+
+    @abstractmethod
+    async def complete(self, text: str) -> str:
+        ...
+
+    async def stream(self, text: str) -> AsyncIterator[str]:
+        yield await self.complete(text)
+
+    async def warm_up(self, ping: bool = False):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class EmergentProvider(LlmProvider):
+    """Pool of reusable LlmChat clients sharing the static system message.
+
+    Clients are checked out exclusively for one call and returned afterwards,
+    keeping their HTTP connections warm instead of paying client construction
+    and handshakes on each plan.
+    """
+
+    name = "emergent"
+
+    def __init__(self, api_key: str, system_message: str, provider: str = "openai", model: str = "gpt-4o",
+                 pool_size: int = 8):
+        from emergentintegrations.llm.chat import LlmChat, UserMessage
+
+        self._chat_class = LlmChat
+        self._message_class = UserMessage
+        self.streams = hasattr(LlmChat, "stream_message")
+        self.api_key = api_key
+        self.system_message = system_message
+        self.provider = provider
+        self.model = model
+        self.pool_size = pool_size
+        self._idle: asyncio.LifoQueue = asyncio.LifoQueue()
+        self.created = 0
+        # Reusing a client is only safe if its transcript can be reset; refuse to start otherwise
+        self._idle.put_nowait(self._new_client())
+
+    def _new_client(self) -> Tuple[Any, list]:
+        self.created += 1
+        client = self._chat_class(
+            api_key=self.api_key,
+            session_id=f"gateway_{uuid.uuid4().hex}",
+            system_message=self.system_message
+        ).with_model(self.provider, self.model)
+        if not isinstance(getattr(client, "messages", None), list):
+            raise RuntimeError(
+                "LlmChat does not keep its transcript in a `messages` list; pooled clients cannot be reset "
+                "between requests and would leak one user's turns into another's"
+            )
+        return client, list(client.messages)
+
+    @asynccontextmanager
+    async def client(self):
+        try:
+            client, baseline = self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            client, baseline = self._new_client()
+        # LlmChat keeps the running transcript on the client; drop the previous call's turns
+        client.messages = list(baseline)
+        try:
+            yield client
+        finally:
+            if self._idle.qsize() < self.pool_size:
+                self._idle.put_nowait((client, baseline))
+
+    async def complete(self, text: str) -> str:
+        async with self.client() as client:
+            return await client.send_message(self._message_class(text=text))
+
+    async def stream(self, text: str) -> AsyncIterator[str]:
+        if not self.streams:
+            yield await self.complete(text)
+            return
+        async with self.client() as client:
+            async for chunk in client.stream_message(self._message_class(text=text)):
+                yield chunk
+
+    async def warm_up(self, ping: bool = False):
+        """Fill the pool ahead of traffic; `ping` also sends one tiny request to open connections."""
+        while self._idle.qsize() < self.pool_size:
+            self._idle.put_nowait(self._new_client())
+        if ping:
+            try:
+                await self.complete("ping")
+            except Exception as e:
+                logger.warning(f"LLM warm-up ping failed: {str(e)}")
+        logger.info(f"LLM gateway warmed: {self._idle.qsize()} {self.provider}/{self.model} clients")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "idleClients": self._idle.qsize(),
+            "clientsCreated": self.created
+        }
+
+
+class MockProviderError(Exception):
+    pass
+
+
+class MockProvider(LlmProvider):
+    """Replays recorded plan JSONs with simulated latency, streaming rate and failures.
+
+    The recording is picked from a hash of the prompt, so the same request
+    always gets the same plan. Latency and injected errors come from a seeded
+    RNG, making a run reproducible for a given call order. Latency is the time
+    to first token; streaming then emits roughly four characters per token at
+    `tokens_per_second`.
+    """
+
+    name = "mock"
+    streams = True
+
+    def __init__(self, recordings: Optional[List[str]] = None, latency_ms: float = 800,
+                 latency_spread: float = 0.5, distribution: str = "lognormal", tokens_per_second: float = 80,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.recordings = recordings or [EXAMPLE_PLAN_JSON]
+        self.latency_ms = latency_ms
+        self.latency_spread = latency_spread
+        self.distribution = distribution
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls) -> "MockProvider":
+        recordings = None
+        directory = os.environ.get("MOCK_LLM_RECORDINGS")
+        if directory:
+            recordings = [path.read_text(encoding="utf-8") for path in sorted(Path(directory).glob("*.json"))]
+        return cls(
+            recordings=recordings,
+            latency_ms=float(os.environ.get("MOCK_LLM_LATENCY_MS", "800")),
+            latency_spread=float(os.environ.get("MOCK_LLM_LATENCY_SPREAD", "0.5")),
+            distribution=os.environ.get("MOCK_LLM_LATENCY_DISTRIBUTION", "lognormal"),
+            tokens_per_second=float(os.environ.get("MOCK_LLM_TOKENS_PER_SECOND", "80")),
+            error_rate=float(os.environ.get("MOCK_LLM_ERROR_RATE", "0")),
+            seed=int(os.environ.get("MOCK_LLM_SEED", "0"))
+        )
+
+    def _first_token_delay(self) -> float:
+        if self.distribution == "fixed":
+            delay = self.latency_ms
+        elif self.distribution == "uniform":
+            spread = self.latency_ms * self.latency_spread
+            delay = self._random.uniform(self.latency_ms - spread, self.latency_ms + spread)
+        else:
+            delay = self.latency_ms * self._random.lognormvariate(0, self.latency_spread)
+        return max(0.0, delay) / 1000
+
+    def _reply(self, text: str) -> str:
+        recording = self.recordings[int(hashlib.sha256(text.encode()).hexdigest(), 16) % len(self.recordings)]
+        if "ETKİNLİK GELİŞTİRME MODU" in text:
+            return json.dumps(json.loads(recording)["blocks"]["activities"][0], ensure_ascii=False)
+        if "PLAN ONARIM MODU" in text or "AYLIK PLAN SENTEZ MODU" in text:
+            return "{}"
+        if "BÖLÜM YENİLEME MODU" in text:
+            match = _NODE_PATH.search(text)
+            try:
+                value = get_path(json.loads(recording), parse_path(match.group(1)))
+            except (AttributeError, ValueError, KeyError, IndexError, TypeError):
+                value = None
+            return json.dumps({"value": value}, ensure_ascii=False)
+        return recording
+
+    def _start_call(self) -> float:
+        self.calls += 1
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            raise MockProviderError("Injected mock LLM failure")
+        return self._first_token_delay()
+
+    async def complete(self, text: str) -> str:
+        delay = self._start_call()
+        reply = self._reply(text)
+        await asyncio.sleep(delay + len(reply) / 4 / self.tokens_per_second)
+        return reply
+
+    async def stream(self, text: str) -> AsyncIterator[str]:
+        delay = self._start_call()
+        reply = self._reply(text)
+        await asyncio.sleep(delay)
+        chunk_chars = 32
+        for start in range(0, len(reply), chunk_chars):
+            yield reply[start:start + chunk_chars]
+            await asyncio.sleep(chunk_chars / 4 / self.tokens_per_second)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "recordings": len(self.recordings),
+            "latencyMs": self.latency_ms,
+            "distribution": self.distribution,
+            "tokensPerSecond": self.tokens_per_second,
+            "errorRate": self.error_rate,
+            "calls": self.calls,
+            "injectedErrors": self.errors
+        }
+
+
+def create_provider(backend: str, api_key: str, system_message: str, provider: str, model: str,
+                    pool_size: int) -> LlmProvider:
+    if backend == "mock":
+        return MockProvider.from_env()
+    if backend == "emergent":
+        return EmergentProvider(api_key, system_message, provider=provider, model=model, pool_size=pool_size)
+    raise ValueError(f"Unknown LLM_BACKEND: {backend}")
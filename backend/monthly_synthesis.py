@@ -0,0 +1,129 @@
+"""Monthly plan synthesis from a month's stored daily plans."""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+MONTHLY_INSTRUCTION_MARKER = "**AYLIK PLAN SENTEZ MODU:**"
+
+
+def month_range(month: str) -> Tuple[datetime, datetime]:
+    """`YYYY-MM` to the half-open range [first day, first day of next month)."""
+    start = datetime.strptime(month, "%Y-%m")
+    end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, end
+
+
+def digest_pipeline(user_id: str, month: str, age_band: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Aggregate the month's daily plans into outcome, theme, material and assessment counts."""
+    start, end = month_range(month)
+    match: Dict[str, Any] = {"userId": ObjectId(user_id), "date": {"$gte": start, "$lt": end}}
+    if age_band:
+        match["ageBand"] = age_band
+
+    def frequency(field: str, limit: int, lower: bool = False) -> List[Dict[str, Any]]:
+        return [
+            {"$unwind": f"${field}"},
+            {"$group": {"_id": {"$toLower": f"${field}"} if lower else f"${field}", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": limit}
+        ]
+
+    return [
+        {"$match": match},
+        {"$project": {
+            "date": 1,
+            "theme": "$planJson.theme",
+            "outcomeCodes": "$planJson.domainOutcomes.code",
+            "activities": "$planJson.blocks.activities",
+            "assessment": "$planJson.blocks.assessment",
+            "conceptualSkills": "$planJson.conceptualSkills",
+            "values": "$planJson.values"
+        }},
+        {"$facet": {
+            "days": [
+                {"$sort": {"date": 1}},
+                {"$project": {"_id": 0, "date": 1, "theme": 1, "activities": "$activities.title"}}
+            ],
+            "themes": [
+                {"$group": {"_id": "$theme", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}}
+            ],
+            "outcomes": frequency("outcomeCodes", 30),
+            "materials": [{"$unwind": "$activities"}] + frequency("activities.materials", 25, lower=True),
+            "assessment": frequency("assessment", 15),
+            "conceptualSkills": frequency("conceptualSkills", 10),
+            "values": frequency("values", 10)
+        }}
+    ]
+
+
+def build_digest(month: str, facets: Dict[str, Any]) -> Dict[str, Any]:
+    def names(key: str) -> List[Any]:
+        return [item["_id"] for item in facets.get(key, []) if item["_id"]]
+
+    return {
+        "month": month,
+        "dayCount": len(facets["days"]),
+        "themes": [{"theme": item["_id"], "days": item["count"]} for item in facets["themes"] if item["_id"]],
+        "outcomes": [{"code": item["_id"], "count": item["count"]} for item in facets["outcomes"] if item["_id"]],
+        "conceptualSkills": names("conceptualSkills"),
+        "values": names("values"),
+        "materials": names("materials"),
+        "assessment": names("assessment"),
+        "days": [
+            {
+                "date": day["date"].strftime("%Y-%m-%d"),
+                "theme": day.get("theme"),
+                "activities": day.get("activities") or []
+            }
+            for day in facets["days"]
+        ]
+    }
+
+
+def template_monthly_plan(digest: Dict[str, Any], age_band: str) -> Dict[str, Any]:
+    """Monthly plan assembled directly from the digest, without an LLM call."""
+    weeks: Dict[str, Dict[str, Any]] = {}
+    for day in digest["days"]:
+        year, week, _ = datetime.strptime(day["date"], "%Y-%m-%d").isocalendar()
+        entry = weeks.setdefault(f"{year}-W{week:02d}", {"week": f"{year}-W{week:02d}", "dates": [], "themes": [],
+                                                         "activities": []})
+        entry["dates"].append(day["date"])
+        if day["theme"] and day["theme"] not in entry["themes"]:
+            entry["themes"].append(day["theme"])
+        entry["activities"].extend(day["activities"])
+
+    return {
+        "type": "monthly",
+        "month": digest["month"],
+        "ageBand": age_band,
+        "themes": [item["theme"] for item in digest["themes"]],
+        "domainOutcomes": [{"code": item["code"], "frequency": item["count"]} for item in digest["outcomes"]],
+        "conceptualSkills": digest["conceptualSkills"],
+        "values": digest["values"],
+        "weeks": list(weeks.values()),
+        "materials": digest["materials"],
+        "assessment": digest["assessment"],
+        "sourceDayCount": digest["dayCount"]
+    }
+
+
+def monthly_instruction(digest: Dict[str, Any]) -> str:
+    summary = {key: value for key, value in digest.items() if key != "days"}
+    summary["days"] = [{"date": day["date"], "theme": day["theme"]} for day in digest["days"]]
+    return f"""{MONTHLY_INSTRUCTION_MARKER}
+Öğretmenin bu aydaki günlük planlarının özeti: {json.dumps(summary, ensure_ascii=False)}
+Bu özete DAYANARAK aylık planı yaz; yeni etkinlik uydurma. YALNIZCA şu alanlarla kısa bir JSON döndür:
+"generalAims" (3-5 amaç), "monthlyOverview" (3-4 cümle), "weeklyFocus" (her hafta için bir cümle),
+"familyCommunityInvolvement", "assessmentPlan" (3-5 madde), "notes"."""
+
+
+def merge_monthly_plan(template: Dict[str, Any], narrative: Dict[str, Any]) -> Dict[str, Any]:
+    plan = {**template, **narrative}
+    # Structural fields always come from the stored plans
+    for key in ("type", "month", "ageBand", "domainOutcomes", "weeks", "sourceDayCount"):
+        plan[key] = template[key]
+    return plan
@@ -0,0 +1,187 @@
+"""Password hashing off the event loop: PBKDF2 in a bounded process pool, with transparent legacy rehash."""
+
+import asyncio
+import hashlib
+import hmac
+import math
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from passlib.context import CryptContext
+from passlib.utils.binary import ab64_encode
+
+_LEGACY_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+@lru_cache(maxsize=None)
+def _context(rounds: int) -> CryptContext:
+    # min_rounds makes needs_update() flag hashes made with an older, lower setting
+    return CryptContext(
+        schemes=["pbkdf2_sha256"], pbkdf2_sha256__default_rounds=rounds, pbkdf2_sha256__min_rounds=rounds
+    )
+
+
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def _hash_batch(passwords: List[str], rounds: int) -> List[str]:
+    context = _context(rounds)
+    return [context.hash(password) for password in passwords]
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return _context(1).verify(password, hashed)
+
+
+def _timed(fn: Callable, *args) -> Tuple[Any, float, float]:
+    """Runs in the worker; returns the result with the wall-clock start and duration."""
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time() - started
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Too many concurrent logins, please retry")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """PBKDF2-SHA256 hashing and verification in a process pool.
+
+    At most `workers` KDF runs execute at once, in separate processes so the
+    event loop keeps serving other requests during a login storm. Callers
+    beyond `max_queue` waiting jobs are rejected with a Retry-After estimate
+    instead of piling up. Legacy unsalted sha256 hashes are checked inline
+    and `verify` returns a replacement hash for them, and for PBKDF2 hashes
+    with fewer than the configured rounds. Every outcome, including a wrong
+    password against a legacy hash or an unknown account, costs one full KDF
+    run, so response time does not reveal which emails exist.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 64, rounds: int = 310000):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self._context = _context(rounds)
+        # Random salt and checksum at full rounds: verifying against it costs a real KDF run and never matches
+        self._dummy_hash = "$pbkdf2-sha256$%d$%s$%s" % (
+            rounds, ab64_encode(os.urandom(16)).decode(), ab64_encode(os.urandom(32)).decode()
+        )
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._bulk_slots = asyncio.Semaphore(max(1, workers - 1))
+        self._pending = 0
+        self._waits: Deque[float] = deque(maxlen=500)
+        self._durations: Deque[float] = deque(maxlen=500)
+        self._completed: Deque[float] = deque(maxlen=5000)
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+        self.rejected = 0
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def retry_after(self) -> int:
+        per_job = sum(self._durations) / len(self._durations) if self._durations else 0.3
+        return max(1, math.ceil(self._pending / self.workers * per_job))
+
+    async def _run(self, fn: Callable, *args, jobs: int = 1) -> Any:
+        """Run `fn` in the pool; `jobs` is how many KDF runs it performs, for queue accounting."""
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HasherBusy(self.retry_after())
+        self.start()
+        self._pending += jobs
+        submitted = time.time()
+        try:
+            result, started, duration = await asyncio.get_running_loop().run_in_executor(
+                self._executor, _timed, fn, *args
+            )
+        finally:
+            self._pending -= jobs
+        self._waits.append(max(0.0, started - submitted))
+        self._durations.append(duration / jobs)
+        self._completed.extend([time.monotonic()] * jobs)
+        return result
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(_hash, password, self.rounds)
+        self.hashed += 1
+        return hashed
+
+    async def hash_many(self, passwords: List[str], rounds: Optional[int] = None,
+                        batch_size: int = 8) -> List[str]:
+        """Hash a bulk import in small batches, leaving a worker free for logins.
+
+        Every import shares one semaphore of `workers - 1` slots (at least one),
+        so concurrent uploads cannot take the whole pool, and a login waits
+        behind at most one short batch. Batches count towards the queue depth
+        and Retry-After like any other job, and raise `HasherBusy` the same
+        way. Hashes made with a lower `rounds` are upgraded by `verify` on the
+        user's first login.
+        """
+
+        async def run(batch: List[str]) -> List[str]:
+            async with self._bulk_slots:
+                hashes = await self._run(_hash_batch, batch, rounds or self.rounds, jobs=len(batch))
+            self.hashed += len(batch)
+            return hashes
+
+        batches = [passwords[start:start + batch_size] for start in range(0, len(passwords), batch_size)]
+        return [hashed for hashes in await asyncio.gather(*map(run, batches)) for hashed in hashes]
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """`(valid, new_hash)`; `new_hash` is set when the stored hash should be replaced."""
+        self.verified += 1
+        if _LEGACY_SHA256.fullmatch(hashed):
+            valid = hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), hashed)
+            if not valid:
+                # The legacy check is instant; pay a KDF run like every other outcome so timing reveals nothing
+                await self._run(_verify, password, self._dummy_hash)
+        else:
+            valid = await self._run(_verify, password, hashed)
+        if not valid:
+            return False, None
+        if _LEGACY_SHA256.fullmatch(hashed) or self._context.needs_update(hashed):
+            self.rehashed += 1
+            return True, await self.hash(password)
+        return True, None
+
+    async def verify_missing(self, password: str) -> bool:
+        """Burn the same KDF time as a real check when the account does not exist, so timing reveals nothing."""
+        self.verified += 1
+        await self._run(_verify, password, self._dummy_hash)
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        waits = sorted(self._waits)
+        return {
+            "scheme": "pbkdf2_sha256",
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "queueDepth": max(0, self._pending - self.workers),
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rehashed": self.rehashed,
+            "rejected": self.rejected,
+            "opsPerSecond": round(sum(1 for done in self._completed if now - done <= 60) / 60, 2),
+            "kdfMsAvg": round(1000 * sum(self._durations) / len(self._durations), 1) if self._durations else 0.0,
+            "queueWaitMsAvg": round(1000 * sum(waits) / len(waits), 1) if waits else 0.0,
+            "queueWaitMsP95": round(1000 * waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0.0
+        }
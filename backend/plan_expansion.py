@@ -0,0 +1,98 @@
+"""Two-stage plan generation: a small skeleton first, then activities expanded in parallel."""
+
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from plan_paths import PathPart, format_path, get_path
+from prompt_builder import plan_digest
+
+SKELETON_INSTRUCTION = """**HIZLI İSKELET MODU:**
+Bu adımda planın yalnızca iskeletini üret. Sadece şu alanlarla JSON döndür:
+"finalize", "type", "ageBand", "date", "theme", "domainOutcomes", "followUpQuestions", "missingFields"
+ve "blocks": {"activities": [...]} içinde her etkinlik için YALNIZCA "title", "location", "duration".
+Malzeme, adım ve diğer bölümleri YAZMA; onlar ayrıca geliştirilecek."""
+
+FRAME_FIELDS = [
+    "conceptualSkills", "dispositions", "values", "crossComponents", "learningOutcomes", "contentFrame",
+    "differentiation", "familyCommunityInvolvement", "notes", "duration", "groupSize"
+]
+FRAME_BLOCK_FIELDS = ["startOfDay", "learningCenters", "mealsCleanup", "assessment"]
+
+
+def activity_instruction(skeleton: Dict[str, Any], index: int) -> str:
+    activity = skeleton["blocks"]["activities"][index]
+    return f"""**ETKİNLİK GELİŞTİRME MODU:**
+Plan özeti: {plan_digest(skeleton)}
+Geliştirilecek etkinlik: {json.dumps(activity, ensure_ascii=False)}
+Bu etkinliği tema ve alan kodlarıyla tutarlı biçimde TAM DETAYLI geliştir. YALNIZCA tek bir etkinlik JSON nesnesi döndür:
+"title", "location", "duration", "materials" (8-12), "steps" (8-12), "mapping" (3-4 kod), "objectives" (3-4), "differentiation"."""
+
+
+def frame_instruction(skeleton: Dict[str, Any]) -> str:
+    return f"""**PLAN ÇERÇEVESİ MODU:**
+Plan özeti: {plan_digest(skeleton)}
+Etkinlikler ayrıca geliştiriliyor. YALNIZCA şu alanlarla JSON döndür:
+{json.dumps(FRAME_FIELDS, ensure_ascii=False)} ve "blocks": {json.dumps(FRAME_BLOCK_FIELDS, ensure_ascii=False)}."""
+
+
+def merge_plan(skeleton: Dict[str, Any], frame: Dict[str, Any], activities: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Assemble the stages into the single-call plan shape."""
+    plan = {key: value for key, value in skeleton.items() if key != "blocks"}
+    for key in FRAME_FIELDS:
+        if key in frame:
+            plan[key] = frame[key]
+    frame_blocks = frame.get("blocks", {}) if isinstance(frame.get("blocks"), dict) else {}
+    plan["blocks"] = {
+        "startOfDay": frame_blocks.get("startOfDay", ""),
+        "learningCenters": frame_blocks.get("learningCenters", []),
+        "activities": activities,
+        "mealsCleanup": frame_blocks.get("mealsCleanup", []),
+        "assessment": frame_blocks.get("assessment", [])
+    }
+    return plan
+
+
+async def generate_two_stage(complete: Callable[[str], Awaitable[str]], parse: Callable[[str], Dict[str, Any]],
+                             prompt: str, max_parallel: int = 4) -> Dict[str, Any]:
+    """Generate the skeleton, then the frame and every activity concurrently.
+
+    Wall-clock time is the skeleton plus the slowest expansion rather than the
+    sum of all activities. A skeleton that asks follow-up questions is
+    returned as-is.
+    """
+    skeleton = parse(await complete(f"{prompt}\n\n{SKELETON_INSTRUCTION}"))
+    outline = skeleton.get("blocks", {}).get("activities", []) if isinstance(skeleton.get("blocks"), dict) else []
+    if not skeleton.get("finalize") or not outline:
+        return skeleton
+
+    slots = asyncio.Semaphore(max_parallel)
+
+    async def expand(instruction: str) -> Dict[str, Any]:
+        async with slots:
+            return parse(await complete(f"{prompt}\n\n{instruction}"))
+
+    frame, *activities = await asyncio.gather(
+        expand(frame_instruction(skeleton)),
+        *[expand(activity_instruction(skeleton, index)) for index in range(len(outline))]
+    )
+    return merge_plan(skeleton, frame, activities)
+
+
+def node_instruction(plan: Dict[str, Any], path: Tuple[PathPart, ...], request: str = "") -> str:
+    return f"""**BÖLÜM YENİLEME MODU:**
+Plan özeti: {plan_digest(plan)}
+Yenilenecek bölüm ({format_path(path)}): {json.dumps(get_path(plan, path), ensure_ascii=False)}
+Öğretmenin isteği: {request or "Bu bölümü farklı ve daha nitelikli biçimde yeniden yaz."}
+Bölümü planın teması ve alan kodlarıyla tutarlı biçimde, AYNI YAPIDA yeniden yaz.
+YALNIZCA {{"value": <yeni bölüm>}} biçiminde JSON döndür."""
+
+
+async def regenerate_node(complete: Callable[[str], Awaitable[str]], parse: Callable[[str], Dict[str, Any]],
+                          context: str, plan: Dict[str, Any], path: Tuple[PathPart, ...], request: str = "") -> Any:
+    """Regenerate only the node at `path`; the model sees a digest of the plan, not the whole plan."""
+    reply = parse(await complete(f"{context}\n\n{node_instruction(plan, path, request)}"))
+    value = reply.get("value")
+    if type(value) is not type(get_path(plan, path)):
+        raise ValueError(f"AI response does not match the structure of {format_path(path)}")
+    return value
@@ -0,0 +1,65 @@
+"""Degraded-mode plans served while the LLM circuit is open."""
+
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from generation_cache import normalize_text
+from prompt_builder import EXAMPLE_PLAN_JSON
+
+_WORD = re.compile(r"\w{3,}")
+_STOPWORDS = {
+    "için", "plan", "planı", "günlük", "hazırla", "hazırlar", "hazırlayın", "oluştur", "oluşturur", "etkinlik",
+    "etkinlikleri", "yaş", "yaşında", "yaşındaki", "yaşı", "grubu", "tema", "temalı", "temasıyla", "bir", "ile",
+    "olan", "lütfen", "ama", "gibi", "çocuklar", "sınıf", "sınıfım", "sınıfı", "okul", "öncesi",
+    "merhaba", "selam", "bana", "misin", "mısın", "musun", "yarın", "bugün", "teşekkürler", "istiyorum"
+}
+
+
+def theme_terms(message: str, limit: int = 8) -> List[str]:
+    terms: List[str] = []
+    for word in _WORD.findall(normalize_text(message)):
+        if word not in _STOPWORDS and not word.isdigit() and word not in terms:
+            terms.append(word)
+    return terms[:limit]
+
+
+async def cached_fallback(collection, age_band: str, message: str) -> Optional[Dict[str, Any]]:
+    """The cached final plan for `age_band` whose theme shares the most words with the message."""
+    terms = theme_terms(message)
+    if not terms:
+        return None
+    docs = await collection.find(
+        {
+            "response.ageBand": age_band,
+            "response.finalize": True,
+            "response.theme": {"$regex": "|".join(re.escape(term) for term in terms), "$options": "i"},
+            "expiresAt": {"$gt": datetime.utcnow()}
+        },
+        {"response": 1}
+    ).sort("createdAt", -1).limit(20).to_list(20)
+    best, best_score = None, 0
+    for doc in docs:
+        theme = normalize_text(str(doc["response"].get("theme", "")))
+        score = sum(1 for term in terms if term in theme)
+        if score > best_score:
+            best, best_score = doc["response"], score
+    return best
+
+
+def template_plan(age_band: str, plan_date: str) -> Dict[str, Any]:
+    """The curriculum example plan, re-dated for the requested day and age band."""
+    plan = json.loads(EXAMPLE_PLAN_JSON)
+    plan["ageBand"] = age_band
+    plan["date"] = plan_date
+    return plan
+
+
+def mark_degraded(plan: Dict[str, Any], source: str) -> Dict[str, Any]:
+    return {
+        **plan,
+        "degraded": True,
+        "degradedSource": source,
+        "degradedReason": "AI servisi şu anda yanıt vermiyor; bu plan hazır bir plandan uyarlanmıştır. Lütfen daha sonra yeniden oluşturun."
+    }
@@ -0,0 +1,185 @@
+"""Mongo-backed plan generation job queue drained by a bounded worker pool."""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class PlanJobQueue:
+    """Persists jobs in `collection` and runs them through `handler`.
+
+    `workers` loops each claim jobs from the collection and run at most
+    `concurrency` of them at a time. A claimed job holds a lease that is
+    renewed while the handler runs; if the process dies mid-job the lease
+    expires and another worker picks it up. Results are only written by the
+    worker that still owns the lease. Failed and abandoned jobs are retried
+    with linear backoff up to `max_attempts`, then marked failed.
+    """
+
+    def __init__(self, collection, handler: JobHandler, workers: int = 4, concurrency: int = 2,
+                 max_attempts: int = 3, lease_seconds: int = 300, poll_interval: float = 1.0):
+        self.collection = collection
+        self.handler = handler
+        self.workers = workers
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self._stopping = False
+
+    async def enqueue(self, user_id: str, request: Dict[str, Any]) -> str:
+        now = datetime.utcnow()
+        result = await self.collection.insert_one({
+            "userId": ObjectId(user_id),
+            "request": request,
+            "status": "queued",
+            "attempts": 0,
+            "result": None,
+            "error": None,
+            "runAt": now,
+            "leaseUntil": None,
+            "createdAt": now,
+            "updatedAt": now
+        })
+        self._wakeup.set()
+        return str(result.inserted_id)
+
+    async def get(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": ObjectId(job_id), "userId": ObjectId(user_id)})
+
+    async def start(self):
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        logger.info(f"Plan job queue started with {self.workers} workers x {self.concurrency} slots")
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "runAt": {"$lte": now}},
+                {"status": "running", "leaseUntil": {"$lt": now}, "attempts": {"$lt": self.max_attempts}}
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "leaseId": ObjectId(),
+                    "leaseUntil": now + timedelta(seconds=self.lease_seconds),
+                    "updatedAt": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("runAt", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _fail_abandoned(self):
+        """Jobs whose worker died on every attempt are failed instead of re-run forever."""
+        now = datetime.utcnow()
+        await self.collection.update_many(
+            {"status": "running", "leaseUntil": {"$lt": now}, "attempts": {"$gte": self.max_attempts}},
+            {"$set": {"status": "failed", "error": "Job lease expired on every attempt",
+                      "leaseUntil": None, "updatedAt": now}}
+        )
+
+    async def _finish(self, job: Dict[str, Any], fields: Dict[str, Any]) -> bool:
+        """Write the outcome only if this worker still holds the job's lease."""
+        result = await self.collection.update_one(
+            {"_id": job["_id"], "leaseId": job["leaseId"]},
+            {"$set": {**fields, "leaseId": None, "leaseUntil": None, "updatedAt": datetime.utcnow()}}
+        )
+        if not result.matched_count:
+            logger.warning(f"Plan job {job['_id']} lost its lease; dropping the outcome of attempt {job['attempts']}")
+        return bool(result.matched_count)
+
+    async def _renew(self, job: Dict[str, Any], task: asyncio.Task):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            now = datetime.utcnow()
+            result = await self.collection.update_one(
+                {"_id": job["_id"], "leaseId": job["leaseId"]},
+                {"$set": {"leaseUntil": now + timedelta(seconds=self.lease_seconds), "updatedAt": now}}
+            )
+            if not result.matched_count:
+                # Another worker took the job over; stop duplicating its work
+                task.cancel()
+                return
+
+    async def _worker(self, number: int):
+        slots = asyncio.Semaphore(self.concurrency)
+        running = set()
+        while not self._stopping:
+            await slots.acquire()
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Plan job worker {number} claim error: {str(e)}")
+                job = None
+            if job is None:
+                slots.release()
+                try:
+                    await self._fail_abandoned()
+                except Exception as e:
+                    logger.error(f"Plan job worker {number} cleanup error: {str(e)}")
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self._run(job, slots))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+    async def _run(self, job: Dict[str, Any], slots: asyncio.Semaphore):
+        task = asyncio.ensure_future(self.handler(job))
+        renewal = asyncio.create_task(self._renew(job, task))
+        try:
+            result = await task
+            await self._finish(job, {"status": "done", "result": result, "error": None})
+        except asyncio.CancelledError:
+            if not task.cancelled() or self._stopping:
+                raise
+            # Cancelled by _renew after losing the lease; the new owner reports the outcome
+            logger.warning(f"Plan job {job['_id']} attempt {job['attempts']} abandoned after losing its lease")
+        except Exception as e:
+            logger.error(f"Plan job {job['_id']} attempt {job['attempts']} failed: {str(e)}")
+            retry = job["attempts"] < self.max_attempts
+            await self._finish(job, {
+                "status": "queued" if retry else "failed",
+                "error": str(e),
+                "runAt": datetime.utcnow() + timedelta(seconds=5 * job["attempts"])
+            })
+        finally:
+            renewal.cancel()
+            slots.release()
+
+
+def serialize_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "jobId": str(job["_id"]),
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "result": job.get("result"),
+        "draftId": job.get("draftId"),
+        "error": job.get("error"),
+        "createdAt": job["createdAt"].isoformat(),
+        "updatedAt": job["updatedAt"].isoformat()
+    }
@@ -0,0 +1,63 @@
+"""Dotted JSON paths into plan documents, e.g. `blocks.activities[2].title`."""
+
+import re
+from typing import Any, Tuple, Union
+
+PathPart = Union[str, int]
+
+_PART = re.compile(r"([^.\[\]]+)|\[(\d+)\]")
+
+
+def parse_path(path: str) -> Tuple[PathPart, ...]:
+    parts = []
+    position = 0
+    for match in _PART.finditer(path):
+        gap = path[position:match.start()]
+        if gap not in ("", "."):
+            raise ValueError(f"Invalid path: {path}")
+        parts.append(match.group(1) if match.group(1) is not None else int(match.group(2)))
+        position = match.end()
+    if not parts or position != len(path):
+        raise ValueError(f"Invalid path: {path}")
+    return tuple(parts)
+
+
+def format_path(path: Tuple[PathPart, ...]) -> str:
+    """Render a path tuple as `blocks.activities[0]`."""
+    text = ""
+    for part in path:
+        if isinstance(part, int):
+            text += f"[{part}]"
+        else:
+            text += f".{part}" if text else part
+    return text
+
+
+def get_path(document: Any, path: Tuple[PathPart, ...]) -> Any:
+    """Value at `path`; raises KeyError, IndexError or TypeError when it does not exist."""
+    for part in path:
+        document = document[part]
+    return document
+
+
+def set_path(document: Any, path: Tuple[PathPart, ...], value: Any):
+    """Set `path`, creating missing objects along the way and appending at an array's end."""
+    for part, following in zip(path, path[1:]):
+        if isinstance(document, dict):
+            if not isinstance(document.get(part), (dict, list)):
+                document[part] = [] if isinstance(following, int) else {}
+            document = document[part]
+        else:
+            if part == len(document):
+                document.append([] if isinstance(following, int) else {})
+            document = document[part]
+    last = path[-1]
+    if isinstance(document, list) and last == len(document):
+        document.append(value)
+    else:
+        document[last] = value
+
+
+def mongo_field(path: Tuple[PathPart, ...]) -> str:
+    """Path in MongoDB dot notation (`blocks.activities.2`)."""
+    return ".".join(str(part) for part in path)
@@ -0,0 +1,197 @@
+"""JSON_SCHEMA enforcement for AI plans with targeted repair of invalid paths."""
+
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from plan_paths import format_path, parse_path, set_path
+from prompt_builder import plan_digest
+
+logger = logging.getLogger(__name__)
+
+# JSON Schema for AI responses
+JSON_SCHEMA = {
+    "type": "object",
+    "required": ["finalize", "type", "ageBand", "date", "domainOutcomes", "blocks"],
+    "properties": {
+        "finalize": {"type": "boolean"},
+        "type": {"enum": ["daily", "monthly"]},
+        "ageBand": {"enum": ["36_48", "48_60", "60_72"]},
+        "date": {"type": "string"},
+        "domainOutcomes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["code"],
+                "properties": {
+                    "code": {"type": "string"},
+                    "indicators": {"type": "array", "items": {"type": "string"}},
+                    "notes": {"type": "string"}
+                },
+                "additionalProperties": True
+            }
+        },
+        "conceptualSkills": {"type": "array", "items": {"type": "string"}},
+        "dispositions": {"type": "array", "items": {"type": "string"}},
+        "crossComponents": {"type": "object"},
+        "contentFrame": {"type": "object"},
+        "blocks": {
+            "type": "object",
+            "properties": {
+                "startOfDay": {"type": "string"},
+                "learningCenters": {"type": "array", "items": {"type": "string"}},
+                "activities": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "required": ["title"],
+                        "properties": {
+                            "title": {"type": "string"},
+                            "location": {"type": "string"},
+                            "materials": {"type": "array", "items": {"type": "string"}},
+                            "steps": {"type": "array", "items": {"type": "string"}},
+                            "mapping": {"type": "array", "items": {"type": "string"}}
+                        }
+                    }
+                },
+                "mealsCleanup": {"type": "array", "items": {"type": "string"}},
+                "assessment": {"type": "array", "items": {"type": "string"}}
+            },
+            "required": ["startOfDay", "activities", "assessment"]
+        },
+        "notes": {"type": "string"},
+        "followUpQuestions": {"type": "array", "items": {"type": "string"}},
+        "missingFields": {"type": "array", "items": {"type": "string"}}
+    },
+    "additionalProperties": True
+}
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "number": (int, float),
+    "integer": int
+}
+
+Check = Callable[[Any, Tuple, List[Tuple[Tuple, str]]], None]
+
+
+def _is_type(value: Any, expected: str) -> bool:
+    if expected in ("number", "integer") and isinstance(value, bool):
+        return False
+    return isinstance(value, _TYPES[expected])
+
+
+def compile_schema(schema: Dict[str, Any]) -> Check:
+    """Turn the subset of JSON Schema used by JSON_SCHEMA into nested closures.
+
+    Supports type, enum, required, properties, items and additionalProperties.
+    The returned check appends `(path, message)` for every violation.
+    """
+    expected = schema.get("type")
+    enum = schema.get("enum")
+    required = schema.get("required", [])
+    properties = {key: compile_schema(value) for key, value in schema.get("properties", {}).items()}
+    items = compile_schema(schema["items"]) if "items" in schema else None
+    additional = schema.get("additionalProperties", True)
+
+    def check(value: Any, path: Tuple, errors: List[Tuple[Tuple, str]]):
+        if expected is not None and not _is_type(value, expected):
+            errors.append((path, f"{expected} olmalı"))
+            return
+        if enum is not None and value not in enum:
+            errors.append((path, f"şunlardan biri olmalı: {', '.join(enum)}"))
+            return
+        if isinstance(value, dict):
+            for key in required:
+                if key not in value:
+                    errors.append((path + (key,), "eksik"))
+            for key, check_property in properties.items():
+                if key in value:
+                    check_property(value[key], path + (key,), errors)
+            if additional is False:
+                for key in value:
+                    if key not in properties:
+                        errors.append((path + (key,), "tanımsız alan"))
+        elif isinstance(value, list) and items is not None:
+            for index, item in enumerate(value):
+                items(item, path + (index,), errors)
+
+    return check
+
+
+class PlanValidator:
+    """Compiled once at startup; validates and repairs finalized plans."""
+
+    def __init__(self, schema: Dict[str, Any], max_errors: int = 20):
+        self._check = compile_schema(schema)
+        self.max_errors = max_errors
+        self.validated = 0
+        self.invalid = 0
+        self.repair_attempts = 0
+        self.repaired = 0
+        self.validation_seconds = 0.0
+        self.repair_seconds = 0.0
+
+    def errors(self, plan: Dict[str, Any]) -> List[Tuple[str, str]]:
+        started = time.perf_counter()
+        errors: List[Tuple[Tuple, str]] = []
+        self._check(plan, (), errors)
+        self.validation_seconds += time.perf_counter() - started
+        self.validated += 1
+        if errors:
+            self.invalid += 1
+        return [(format_path(path), message) for path, message in errors[:self.max_errors]]
+
+    def repair_instruction(self, plan: Dict[str, Any], errors: List[Tuple[str, str]]) -> str:
+        problems = "\n".join(f"- {path or '(kök)'}: {message}" for path, message in errors)
+        return f"""**PLAN ONARIM MODU:**
+Plan özeti: {plan_digest(plan)}
+Plandaki şu yollar şemaya uymuyor:
+{problems}
+Planın geri kalanını TEKRAR ÜRETME. YALNIZCA anahtarları bu yollar olan tek bir JSON nesnesi döndür,
+örn. {{"blocks.assessment": ["Gözlem formu", "Anekdot kaydı"]}}."""
+
+    async def validate_and_repair(self, plan: Dict[str, Any], complete: Callable[[str], Awaitable[str]],
+                                  parse: Callable[[str], Dict[str, Any]], context: str,
+                                  max_rounds: int = 1) -> Dict[str, Any]:
+        """Validate a finalized plan and patch only the invalid paths via the LLM.
+
+        Follow-up turns (`finalize: false`) carry no plan body and are not checked.
+        """
+        if not plan.get("finalize"):
+            return plan
+        errors = self.errors(plan)
+        for _ in range(max_rounds):
+            if not errors:
+                break
+            self.repair_attempts += 1
+            started = time.perf_counter()
+            try:
+                patch = parse(await complete(f"{context}\n\n{self.repair_instruction(plan, errors)}"))
+            except Exception as e:
+                # An unrepaired plan is still better than failing the whole request
+                logger.warning(f"Plan repair failed: {str(e)}")
+                self.repair_seconds += time.perf_counter() - started
+                break
+            requested = {path for path, _ in errors}
+            for path, value in patch.items():
+                if path in requested and path:
+                    set_path(plan, parse_path(path), value)
+            self.repair_seconds += time.perf_counter() - started
+            errors = self.errors(plan)
+            if not errors:
+                self.repaired += 1
+        return plan
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "validated": self.validated,
+            "invalid": self.invalid,
+            "repairAttempts": self.repair_attempts,
+            "repaired": self.repaired,
+            "validationMsAvg": round(1000 * self.validation_seconds / self.validated, 3) if self.validated else 0.0,
+            "repairMsAvg": round(1000 * self.repair_seconds / self.repair_attempts, 1) if self.repair_attempts else 0.0
+        }
@@ -0,0 +1,150 @@
+"""Incremental plan parsing and Server-Sent Events helpers for /api/ai/chat/stream."""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from plan_paths import format_path
+
+# Sections forwarded to the client as soon as they are complete
+SECTION_PATHS = {("theme",), ("domainOutcomes",)}
+ACTIVITIES_PATH = ("blocks", "activities")
+
+
+def is_section_path(path: Tuple) -> bool:
+    if path in SECTION_PATHS:
+        return True
+    return len(path) == 3 and path[:2] == ACTIVITIES_PATH and isinstance(path[2], int)
+
+
+class PlanSectionParser:
+    """Scans streamed model output and reports plan sections once they fully parse.
+
+    Text is fed in arbitrary chunks; every character is visited exactly once.
+    Anything before the first `{` (prose, code fences) is skipped and scanning
+    stops when the root object closes.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._finished = False
+        self._stack: List[Dict[str, Any]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._scalar_start: Optional[int] = None
+        self._capture: Optional[Tuple[Tuple, int, int]] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk and return `(path, value)` for each completed section."""
+        self._buffer += chunk
+        sections = []
+        while self._pos < len(self._buffer) and not self._finished:
+            section = self._step(self._buffer[self._pos], self._pos)
+            if section:
+                sections.append(section)
+            self._pos += 1
+        return sections
+
+    def _value_path(self) -> Optional[Tuple]:
+        if not self._stack:
+            return ()
+        frame = self._stack[-1]
+        if frame["type"] == "object":
+            return frame["path"] + (frame["key"],) if frame["expect"] == "value" else None
+        return frame["path"] + (frame["index"],)
+
+    def _start_value(self, pos: int) -> Optional[Tuple]:
+        path = self._value_path()
+        if path is not None and self._capture is None and is_section_path(path):
+            self._capture = (path, pos, len(self._stack))
+        return path
+
+    def _end_value(self, end: int) -> Optional[Tuple[str, Any]]:
+        if self._stack and self._stack[-1]["type"] == "object":
+            self._stack[-1]["expect"] = "comma"
+        if self._capture is None or self._capture[2] != len(self._stack):
+            return None
+        path, start, _ = self._capture
+        self._capture = None
+        try:
+            return format_path(path), json.loads(self._buffer[start:end])
+        except json.JSONDecodeError:
+            return None
+
+    def _end_scalar(self, pos: int) -> Optional[Tuple[str, Any]]:
+        if self._scalar_start is None:
+            return None
+        self._scalar_start = None
+        return self._end_value(pos)
+
+    def _step(self, char: str, pos: int) -> Optional[Tuple[str, Any]]:
+        if not self._started:
+            if char == "{":
+                self._started = True
+                self._stack.append({"type": "object", "path": (), "expect": "key", "key": None})
+            return None
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                frame = self._stack[-1]
+                if frame["type"] == "object" and frame["expect"] == "key":
+                    frame["key"] = json.loads(self._buffer[self._string_start:pos + 1])
+                    frame["expect"] = "colon"
+                    return None
+                return self._end_value(pos + 1)
+            return None
+
+        section = self._end_scalar(pos) if char in ",}] \t\r\n" else None
+
+        if char == '"':
+            self._in_string = True
+            self._string_start = pos
+            frame = self._stack[-1]
+            if not (frame["type"] == "object" and frame["expect"] == "key"):
+                self._start_value(pos)
+        elif char in "{[":
+            path = self._start_value(pos)
+            if char == "{":
+                self._stack.append({"type": "object", "path": path, "expect": "key", "key": None})
+            else:
+                self._stack.append({"type": "array", "path": path, "index": 0})
+        elif char in "}]":
+            self._stack.pop()
+            if not self._stack:
+                self._finished = True
+                return section
+            closed = self._end_value(pos + 1)
+            return section or closed
+        elif char == ":":
+            self._stack[-1]["expect"] = "value"
+        elif char == ",":
+            frame = self._stack[-1]
+            if frame["type"] == "object":
+                frame["expect"] = "key"
+            else:
+                frame["index"] += 1
+        elif char not in " \t\r\n" and self._scalar_start is None:
+            self._scalar_start = pos
+            self._start_value(pos)
+        return section
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Encode one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def iter_sections(plan: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """Sections of an already complete plan, in the order a stream would emit them."""
+    sections = [(format_path(path), plan[path[0]]) for path in (("theme",), ("domainOutcomes",)) if path[0] in plan]
+    activities = plan.get("blocks", {}).get("activities", []) if isinstance(plan.get("blocks"), dict) else []
+    for index, activity in enumerate(activities):
+        sections.append((format_path(ACTIVITIES_PATH + (index,)), activity))
+    return sections
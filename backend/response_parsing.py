@@ -0,0 +1,194 @@
+"""Extract plan JSON from raw model output in one linear, brace-aware pass."""
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ResponseParseError(ValueError):
+    pass
+
+
+# Truncated output is repaired from at most this many open objects, outermost first
+MAX_REPAIR_ATTEMPTS = 3
+PLAN_ROOT_KEYS = ("finalize", "type")
+# Pathologically deep nesting overflows the decoder instead of failing to parse
+_DECODE_ERRORS = (json.JSONDecodeError, RecursionError)
+
+
+def _close(stack: List[List[Any]]) -> str:
+    return "".join("}" if frame[0] == "{" else "]" for frame in reversed(stack))
+
+
+def _complete_scalar(token: str) -> bool:
+    try:
+        json.loads(token)
+        return True
+    except json.JSONDecodeError:
+        return False
+
+
+def _json_like(text: str, start: int) -> bool:
+    """Whether the `{` at `start` opens a JSON object (`{"` or `{}`) rather than prose."""
+    rest = text[start + 1:start + 65].lstrip()
+    return not rest or rest[0] in '"}'
+
+
+def is_plan_response(value: Dict[str, Any]) -> bool:
+    """A plan or follow-up turn, as opposed to some nested object salvaged from broken output."""
+    return any(key in value for key in PLAN_ROOT_KEYS)
+
+
+def extract_json(text: str) -> Tuple[Any, str]:
+    """Return `(value, how)` where `how` is "direct", "extracted" or "repaired".
+
+    One pass with a single bracket stack over the whole text. Prose and code
+    fences outside any object are skipped. When a top-level object closes it
+    is parsed; if that fails the scan resumes after it, never inside it, so a
+    malformed plan cannot yield one of its nested objects. If the text ends
+    with objects still open, it is cut back to the last complete value and
+    repaired from the outermost open `{"` (at most MAX_REPAIR_ATTEMPTS
+    tries); complete objects nested in an unclosed prose brace are tried as
+    well. A repair that keeps no fields is rejected.
+    """
+    try:
+        return json.loads(text), "direct"
+    except _DECODE_ERRORS:
+        pass
+
+    # Each frame is [bracket, expecting_key, start, closed_child_spans]
+    stack: List[List[Any]] = []
+    in_string = escape = False
+    string_is_key = False
+    scalar_start: Optional[int] = None
+    safe = 0
+    index = text.find("{")
+    while index != -1 and index < len(text):
+        if not stack:
+            # Outside any object: jump to the next candidate
+            index = text.find("{", index)
+            if index == -1:
+                break
+            stack.append(["{", True, index, []])
+            in_string = escape = False
+            scalar_start = None
+            safe = index + 1
+            index += 1
+            continue
+
+        char = text[index]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+                if not string_is_key:
+                    safe = index + 1
+            index += 1
+            continue
+
+        if scalar_start is not None and char in ",}] \t\r\n":
+            scalar_start = None
+            safe = index
+
+        frame = stack[-1]
+        if char == '"':
+            in_string = True
+            string_is_key = frame[0] == "{" and frame[1]
+        elif char in "{[":
+            stack.append([char, True, index, []])
+            safe = index + 1
+        elif char in "}]":
+            closed = stack.pop()
+            safe = index + 1
+            if not stack:
+                try:
+                    return json.loads(text[closed[2]:index + 1]), "extracted"
+                except _DECODE_ERRORS:
+                    pass
+            elif closed[0] == "{" and stack[-1][0] == "{" and not _json_like(text, stack[-1][2]):
+                stack[-1][3].append((closed[2], index + 1))
+        elif char == ":":
+            frame[1] = False
+        elif char == ",":
+            frame[1] = True
+        elif char not in " \t\r\n" and scalar_start is None:
+            scalar_start = index
+        index += 1
+
+    if not stack:
+        raise ResponseParseError("No JSON object found in AI response")
+
+    if scalar_start is not None and _complete_scalar(text[scalar_start:]):
+        safe = len(text)
+    attempts = 0
+    for depth, frame in enumerate(stack):
+        if frame[0] != "{":
+            continue
+        if _json_like(text, frame[2]):
+            if attempts >= MAX_REPAIR_ATTEMPTS:
+                break
+            attempts += 1
+            candidate = text[frame[2]:safe].rstrip().rstrip(",")
+            try:
+                value = json.loads(candidate + _close(stack[depth:]))
+            except _DECODE_ERRORS:
+                continue
+            # Output cut off inside its first value repairs to `{}`, which is not a usable answer
+            if value:
+                return value, "repaired"
+        else:
+            # An unclosed brace in prose; a complete object inside it may be the answer
+            for child_start, child_end in frame[3]:
+                try:
+                    value = json.loads(text[child_start:child_end])
+                except _DECODE_ERRORS:
+                    continue
+                if value:
+                    return value, "extracted"
+
+    raise ResponseParseError("No JSON object found in AI response")
+
+
+class ParseStats:
+    """Counters for how AI responses were parsed and how long it took."""
+
+    def __init__(self):
+        self.outcomes = {"direct": 0, "extracted": 0, "repaired": 0, "failed": 0}
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, how: str, seconds: float):
+        self.outcomes[how] += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.outcomes.values())
+        return {
+            **self.outcomes,
+            "failureRate": round(self.outcomes["failed"] / total, 4) if total else 0.0,
+            "parseMsAvg": round(1000 * self.total_seconds / total, 3) if total else 0.0,
+            "parseMsMax": round(1000 * self.max_seconds, 3)
+        }
+
+
+parse_stats = ParseStats()
+
+
+def parse_response(text: str, outcomes: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Parse a plan object; `outcomes`, if given, collects how it was parsed so callers can skip caching repairs."""
+    started = time.perf_counter()
+    try:
+        value, how = extract_json(text)
+        if not isinstance(value, dict):
+            raise ResponseParseError("AI response is not a JSON object")
+    except ResponseParseError:
+        parse_stats.record("failed", time.perf_counter() - started)
+        raise
+    parse_stats.record(how, time.perf_counter() - started)
+    if outcomes is not None:
+        outcomes.append(how)
+    return value
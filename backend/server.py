@@ -1,6 +1,7 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
@@ -9,13 +10,38 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timedelta
-import hashlib
 import jwt
 from dotenv import load_dotenv
-from emergentintegrations.llm.chat import LlmChat, UserMessage
 import json
 import asyncio
+import time
 from bson import ObjectId
+from plan_stream import PlanSectionParser, iter_sections, sse_event
+from plan_jobs import PlanJobQueue, serialize_job
+from generation_cache import GenerationCache, generation_key
+from ttl_cache import TTLCache
+from auth_tokens import TokenRevocations, TokenVerifier, create_token, principal_from_claims
+from passwords import HasherBusy, PasswordHasher
+from teacher_provisioning import (
+    ProvisioningInputError, insert_teachers, parse_teacher_rows, summarize, teacher_document, validate_rows
+)
+from singleflight import SingleFlight
+from llm_admission import LlmAdmission, AdmissionRejected
+from history_budget import compact_history
+from chat_sessions import ChatSessionStore
+from prompt_builder import STATIC_PREFIX, build_batch_day_message, build_context, build_prompt_text, prefix_stats
+from llm_gateway import LlmGateway, LlmDeadlineExceeded, RetryBudget
+from circuit_breaker import CircuitBreaker, CircuitOpen
+from plan_fallback import cached_fallback, mark_degraded, template_plan
+from turn_router import TurnRouter
+from llm_providers import create_provider
+from plan_expansion import generate_two_stage, regenerate_node
+from plan_paths import format_path, get_path, mongo_field, parse_path
+from response_parsing import ResponseParseError, is_plan_response, parse_response, parse_stats
+from plan_schema import JSON_SCHEMA, PlanValidator
+from monthly_synthesis import (
+    build_digest, digest_pipeline, merge_monthly_plan, month_range, monthly_instruction, template_monthly_plan
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -23,13 +49,120 @@ load_dotenv(ROOT_DIR / '.env')
 # Environment variables
 MONGO_URL = os.environ['MONGO_URL']
 DB_NAME = os.environ['DB_NAME']
-EMERGENT_LLM_KEY = os.environ['EMERGENT_LLM_KEY']
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'emergent')  # "emergent" or "mock"
+EMERGENT_LLM_KEY = os.environ['EMERGENT_LLM_KEY'] if LLM_BACKEND == 'emergent' else os.environ.get('EMERGENT_LLM_KEY', '')
 JWT_SECRET = os.environ.get('JWT_SECRET', 'maarif-secret-key-2024')
+PLAN_JOB_WORKERS = int(os.environ.get('PLAN_JOB_WORKERS', '4'))
+PLAN_JOB_CONCURRENCY = int(os.environ.get('PLAN_JOB_CONCURRENCY', '2'))
+PLAN_JOB_MAX_ATTEMPTS = int(os.environ.get('PLAN_JOB_MAX_ATTEMPTS', '3'))
+GENERATION_CACHE_SIZE = int(os.environ.get('GENERATION_CACHE_SIZE', '1000'))
+GENERATION_CACHE_TTL = int(os.environ.get('GENERATION_CACHE_TTL', '86400'))
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '16'))
+LLM_MAX_QUEUE_WAIT = float(os.environ.get('LLM_MAX_QUEUE_WAIT', '15'))
+LLM_MAX_QUEUE = int(os.environ.get('LLM_MAX_QUEUE', '500'))
+LLM_SCHOOL_WEIGHTS = json.loads(os.environ.get('LLM_SCHOOL_WEIGHTS', '{}'))
+HISTORY_TOKEN_BUDGET = int(os.environ.get('HISTORY_TOKEN_BUDGET', '3000'))
+HISTORY_VERBATIM_TURNS = int(os.environ.get('HISTORY_VERBATIM_TURNS', '4'))
+CHAT_SESSION_CACHE_SIZE = int(os.environ.get('CHAT_SESSION_CACHE_SIZE', '2000'))
+CHAT_SESSION_CACHE_TTL = int(os.environ.get('CHAT_SESSION_CACHE_TTL', '3600'))
+LLM_PROVIDER = os.environ.get('LLM_PROVIDER', 'openai')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'gpt-4o')
+LLM_CLIENT_POOL_SIZE = int(os.environ.get('LLM_CLIENT_POOL_SIZE', '8'))
+LLM_WARMUP_PING = os.environ.get('LLM_WARMUP_PING', 'false').lower() == 'true'
+LLM_DEADLINE = float(os.environ.get('LLM_DEADLINE', '90'))
+LLM_HEDGE_MIN_DELAY = float(os.environ.get('LLM_HEDGE_MIN_DELAY', '2'))
+LLM_RETRY_BUDGET_RATIO = float(os.environ.get('LLM_RETRY_BUDGET_RATIO', '0.1'))
+LLM_MAX_ATTEMPTS = int(os.environ.get('LLM_MAX_ATTEMPTS', '2'))
+LLM_BREAKER_MIN_CALLS = int(os.environ.get('LLM_BREAKER_MIN_CALLS', '10'))
+LLM_BREAKER_FAILURE_RATIO = float(os.environ.get('LLM_BREAKER_FAILURE_RATIO', '0.5'))
+LLM_BREAKER_SLOW_SECONDS = float(os.environ.get('LLM_BREAKER_SLOW_SECONDS', '60'))
+LLM_BREAKER_OPEN_SECONDS = float(os.environ.get('LLM_BREAKER_OPEN_SECONDS', '30'))
+PLAN_EXPANSION_PARALLELISM = int(os.environ.get('PLAN_EXPANSION_PARALLELISM', '4'))
+PLAN_REPAIR_ROUNDS = int(os.environ.get('PLAN_REPAIR_ROUNDS', '1'))
+PLAN_BATCH_CONCURRENCY = int(os.environ.get('PLAN_BATCH_CONCURRENCY', '5'))
+PLAN_BATCH_MAX_DAYS = int(os.environ.get('PLAN_BATCH_MAX_DAYS', '31'))
+TURN_ROUTING = os.environ.get('TURN_ROUTING', 'true').lower() == 'true'
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', '60'))
+JWT_CLAIMS = os.environ.get('JWT_CLAIMS', 'false').lower() == 'true'
+TOKEN_REVOCATION_REFRESH = float(os.environ.get('TOKEN_REVOCATION_REFRESH', '15'))
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '10000'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', '64'))
+PASSWORD_HASH_ROUNDS = int(os.environ.get('PASSWORD_HASH_ROUNDS', '310000'))
+# Full strength by default; a lower value speeds up imports, and those hashes are upgraded at first login
+BULK_PASSWORD_HASH_ROUNDS = int(os.environ.get('BULK_PASSWORD_HASH_ROUNDS', str(PASSWORD_HASH_ROUNDS)))
+BULK_PROVISION_MAX_ROWS = int(os.environ.get('BULK_PROVISION_MAX_ROWS', '1000'))
+BULK_PROVISION_MAX_BYTES = int(os.environ.get('BULK_PROVISION_MAX_BYTES', str(5 * 1024 * 1024)))
+# Comma-separated emails of existing accounts granted the admin role at startup (school administrators).
+# Registration never grants it, since emails are not verified.
+ADMIN_EMAILS = [email.strip() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()]
 
 # MongoDB connection
 client = AsyncIOMotorClient(MONGO_URL)
 db = client[DB_NAME]
 
+# Generated plan cache
+generation_cache = GenerationCache(db.generation_cache, maxsize=GENERATION_CACHE_SIZE, ttl=GENERATION_CACHE_TTL)
+plan_flights = SingleFlight()
+
+# Server-side chat sessions
+chat_sessions = ChatSessionStore(
+    db.chat_sessions,
+    db.chat_history,
+    maxsize=CHAT_SESSION_CACHE_SIZE,
+    ttl=CHAT_SESSION_CACHE_TTL
+)
+
+# LLM admission control
+llm_admission = LlmAdmission(
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    max_wait=LLM_MAX_QUEUE_WAIT,
+    max_queue=LLM_MAX_QUEUE,
+    school_weights=LLM_SCHOOL_WEIGHTS
+)
+
+# Authenticated users, so cheap endpoints skip the users lookup
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+token_revocations = TokenRevocations(db.users, refresh_interval=TOKEN_REVOCATION_REFRESH)
+token_verifier = TokenVerifier(JWT_SECRET, maxsize=TOKEN_CACHE_SIZE)
+
+# Password KDF runs in worker processes, off the event loop
+password_hasher = PasswordHasher(
+    workers=PASSWORD_HASH_WORKERS,
+    max_queue=PASSWORD_HASH_MAX_QUEUE,
+    rounds=PASSWORD_HASH_ROUNDS
+)
+
+# Follow-up turns answered locally instead of by the model
+turn_router = TurnRouter(enabled=TURN_ROUTING)
+
+# AI plan validation, compiled once
+plan_validator = PlanValidator(JSON_SCHEMA)
+
+# Shared LLM clients
+llm_gateway = LlmGateway(
+    create_provider(
+        LLM_BACKEND,
+        EMERGENT_LLM_KEY,
+        STATIC_PREFIX.text,
+        provider=LLM_PROVIDER,
+        model=LLM_MODEL,
+        pool_size=LLM_CLIENT_POOL_SIZE
+    ),
+    admission=llm_admission,
+    timeout=LLM_DEADLINE,
+    hedge_min_delay=LLM_HEDGE_MIN_DELAY,
+    retry_budget=RetryBudget(ratio=LLM_RETRY_BUDGET_RATIO),
+    max_attempts=LLM_MAX_ATTEMPTS,
+    breaker=CircuitBreaker(
+        min_calls=LLM_BREAKER_MIN_CALLS,
+        failure_ratio=LLM_BREAKER_FAILURE_RATIO,
+        slow_call_seconds=LLM_BREAKER_SLOW_SECONDS,
+        open_seconds=LLM_BREAKER_OPEN_SECONDS
+    )
+)
+
 # FastAPI app
 app = FastAPI(title="MaarifPlanner API", version="1.0.0")
 
@@ -66,6 +199,10 @@ class UserLogin(BaseModel):
     email: str
     password: str
 
+class PasswordChange(BaseModel):
+    currentPassword: str
+    newPassword: str
+
 class UserResponse(BaseModel):
     id: str
     email: str
@@ -84,11 +221,29 @@ class PlanGenerateRequest(BaseModel):
     history: List[ChatMessage] = []
     ageBand: str = "60_72"
     planType: str = "daily"  # "daily" or "monthly"
+    mode: str = "single"  # "single" or "two_stage"
+    date: Optional[str] = None  # YYYY-MM-DD, defaults to today
+
+class ChatSessionCreate(BaseModel):
+    ageBand: str = "60_72"
+    planType: str = "daily"  # "daily" or "monthly"
+
+class ChatSessionMessage(BaseModel):
+    message: str
+
+class DailyPlanBatchCreate(BaseModel):
+    startDate: str  # YYYY-MM-DD
+    endDate: str  # YYYY-MM-DD
+    ageBand: str = "60_72"
+    themes: List[str]  # assigned to the days in order, repeating
+    skipWeekends: bool = True
+    notes: Optional[str] = None
 
 class DailyPlanCreate(BaseModel):
     date: str  # YYYY-MM-DD
-    ageBand: str
-    planJson: Dict[str, Any]
+    ageBand: Optional[str] = None  # defaults to the plan's own age band
+    planJson: Optional[Dict[str, Any]] = None
+    draftId: Optional[str] = None  # X-Draft-Id of a generated plan, instead of re-sending planJson
     title: Optional[str] = None
 
 class MonthlyPlanCreate(BaseModel):
@@ -97,6 +252,20 @@ class MonthlyPlanCreate(BaseModel):
     planJson: Dict[str, Any]
     title: Optional[str] = None
 
+class MonthlyPlanSynthesize(BaseModel):
+    month: str  # YYYY-MM
+    ageBand: Optional[str] = None  # defaults to all of the month's plans
+    useLlm: bool = True
+    title: Optional[str] = None
+
+class PlanNodeRegenerate(BaseModel):
+    path: str  # e.g. "blocks.activities[2]"
+    request: Optional[str] = None  # what the teacher wants changed
+
+class DraftNodeRegenerate(PlanNodeRegenerate):
+    planJson: Optional[Dict[str, Any]] = None
+    draftId: Optional[str] = None  # regenerate in the server-held draft so saving by draftId keeps the change
+
 class PortfolioPhotoCreate(BaseModel):
     planId: str
     activityTitle: str
@@ -104,386 +273,101 @@ class PortfolioPhotoCreate(BaseModel):
     description: Optional[str] = None
 
 # Utility functions
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def verify_password(password: str, hashed: str) -> bool:
-    return hash_password(password) == hashed
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except HasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
-def create_jwt_token(user_id: str) -> str:
-    payload = {
-        "user_id": user_id,
-        "exp": datetime.utcnow() + timedelta(days=7)
-    }
-    return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
+async def verify_password(password: str, user: Optional[dict]) -> bool:
+    """Check the password and upgrade a legacy or outdated stored hash on success.
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    A missing user still pays for a full KDF run, so login timing does not reveal which emails exist.
+    """
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=["HS256"])
-        user_id = payload.get("user_id")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
         if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        
-        return user
+            return await password_hasher.verify_missing(password)
+        valid, new_hash = await password_hasher.verify(password, user["passwordHash"])
+    except HasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    if new_hash is not None:
+        # Conditional on the old hash so a concurrent password change wins
+        await db.users.update_one(
+            {"_id": user["_id"], "passwordHash": user["passwordHash"]},
+            {"$set": {"passwordHash": new_hash}}
+        )
+    return valid
+
+def create_jwt_token(user: dict) -> str:
+    # Claims tokens carry the profile snapshot so read-only endpoints need no lookup
+    return create_token(user, JWT_SECRET, with_claims=JWT_CLAIMS)
+
+# Only the fields request handlers use; never the password hash
+USER_PROJECTION = {
+    "email": 1, "name": 1, "school": 1, "className": 1, "ageDefault": 1, "role": 1, "tokenVersion": 1
+}
+
+async def load_user(user_id: str) -> Optional[dict]:
+    """User principal by id, served from `user_cache` for up to USER_CACHE_TTL seconds.
+
+    The returned dict is shared between requests and must not be mutated.
+    """
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_PROJECTION)
+        if user is not None:
+            user_cache.set(user_id, user)
+    return user
+
+def invalidate_user(user_id: str):
+    """Call after any change to a user's profile or password."""
+    user_cache.pop(str(user_id))
+
+def verify_token(credentials: HTTPAuthorizationCredentials) -> dict:
+    try:
+        payload = token_verifier.decode(credentials.credentials)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except (jwt.InvalidTokenError, jwt.DecodeError, Exception):
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("user_id") is None:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if token_revocations.is_revoked(payload):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return payload
 
-# JSON Schema for AI responses
-JSON_SCHEMA = {
-    "type": "object",
-    "required": ["finalize", "type", "ageBand", "date", "domainOutcomes", "blocks"],
-    "properties": {
-        "finalize": {"type": "boolean"},
-        "type": {"enum": ["daily", "monthly"]},
-        "ageBand": {"enum": ["36_48", "48_60", "60_72"]},
-        "date": {"type": "string"},
-        "domainOutcomes": {
-            "type": "array",
-            "items": {
-                "type": "object",
-                "required": ["code"],
-                "properties": {
-                    "code": {"type": "string"},
-                    "indicators": {"type": "array", "items": {"type": "string"}},
-                    "notes": {"type": "string"}
-                },
-                "additionalProperties": True
-            }
-        },
-        "conceptualSkills": {"type": "array", "items": {"type": "string"}},
-        "dispositions": {"type": "array", "items": {"type": "string"}},
-        "crossComponents": {"type": "object"},
-        "contentFrame": {"type": "object"},
-        "blocks": {
-            "type": "object",
-            "properties": {
-                "startOfDay": {"type": "string"},
-                "learningCenters": {"type": "array", "items": {"type": "string"}},
-                "activities": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "required": ["title"],
-                        "properties": {
-                            "title": {"type": "string"},
-                            "location": {"type": "string"},
-                            "materials": {"type": "array", "items": {"type": "string"}},
-                            "steps": {"type": "array", "items": {"type": "string"}},
-                            "mapping": {"type": "array", "items": {"type": "string"}}
-                        }
-                    }
-                },
-                "mealsCleanup": {"type": "array", "items": {"type": "string"}},
-                "assessment": {"type": "array", "items": {"type": "string"}}
-            },
-            "required": ["startOfDay", "activities", "assessment"]
-        },
-        "notes": {"type": "string"},
-        "followUpQuestions": {"type": "array", "items": {"type": "string"}},
-        "missingFields": {"type": "array", "items": {"type": "string"}}
-    },
-    "additionalProperties": True
-}
+async def user_from_token(payload: dict) -> dict:
+    try:
+        user = await load_user(payload["user_id"])
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    if payload.get("tv", 0) < user.get("tokenVersion", 0):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return user
 
-SYSTEM_PROMPT = """Sen Türkiye Yüzyılı Maarif Modeli **Okul Öncesi** programına göre çalışan uzman bir PLAN ASİSTANI'sın.
-Öğretmen isteklerini PROFESYONEL KALITEDE, MEB onaylı günlük planına dönüştürürsün. Yüklediğin PDF örneğindeki kaliteye ve detay seviyesine eşit planlar üreteceksin.
-
-**MUTLAK KURALLAR:**
-- Eksik bilgi varsa: "finalize": false, "followUpQuestions", "missingFields" doldur.
-- Yeterli bilgi varsa: "finalize": true ve **HER BÖLÜMÜ PROFESYONEL SEVIYEDE** doldur.
-- **GERÇEK ÖĞRETMEN PLANINA UYGUN** - Uygulanabilir, detaylı ve eğitim bilimsel temellerle hazırlanmış.
-- **HER ETKİNLİK TAMAMEN GELİŞTİRİLMİŞ** olacak, sadece başlık değil tam içerik.
-
-**TUTARLILIK VE BİRLİK KURALLARI:**
-- **TÜM VERİLER TUTARLI VE BİRBİRİYLE İLİŞKİLİ OLMALI** - Etkinlikler, malzemeler, alan kodları, değerlendirme yöntemleri birbiriyle uyumlu
-- **TEMA BÜTÜNLÜĞÜ** - Tüm etkinlikler aynı tema etrafında organize edilmeli
-- **YAŞ GRUBUNA UYGUNLUK** - Tüm etkinlikler, malzemeler ve hedefler yaş grubuna uygun
-- **SÜREKLİLİK** - Etkinlikler mantıklı sıra ve akışta, birbiriyle bağlantılı
-- **GERÇEKÇİLİK** - Malzemeler ve etkinlikler okul ortamında uygulanabilir
-
-**MEB GÜNLÜK PLAN YAPISI (Türkiye Yüzyılı Maarif Modeli):**
-
-**1. PLAN TEMEL BİLGİLERİ:**
-- Tarih (ISO format)
-- Yaş bandı (36_48: 36-48 ay, 48_60: 48-60 ay, 60_72: 60-72 ay)
-- Ana tema/konu
-- Günlük süre (Tam gün/Yarım gün)
-
-**2. ALAN BECERİLERİ (domainOutcomes) - MİNİMUM 3-4 FARKLI ALAN:**
-
-**Türkçe Alanı (TAE):**
-- TAEOB1: Erken Okuryazarlık Becerileri
-- TAEOB2: Dinleme Becerileri  
-- TAEOB3: Konuşma Becerileri
-- TAEOB4: Öncül Yazma Becerileri
-
-**Matematik Alanı (MAB):**
-- MAB1: Sayı ve İşlemler
-- MAB2: Ölçme
-- MAB3: Geometri ve Mekân
-- MAB4: Veri İşleme
-
-**Fen Alanı (HSAB):**
-- HSAB1: Canlılar Dünyası
-- HSAB2: Madde ve Değişim
-- HSAB3: Fiziksel Olaylar
-- HSAB4: Dünya ve Evren
-
-**Sanat Alanı (SNAB):**
-- SNAB1: Sanatsal İfade
-- SNAB2: Sanatsal Üretim
-- SNAB3: Sanatsal Değerlendirme
-- SNAB4: Sanatsal Uygulama Yapma
-
-**Müzik Alanı (MHB):**
-- MHB1: Müziksel Algı
-- MHB2: Müziksel İfade
-- MHB3: Müziksel Yaratıcılık
-- MHB4: Müziksel Hareket Becerisi
-
-**Sosyal-Duygusal Öğrenme (SDB):**
-- SDB1: Sosyal Beceriler
-- SDB2: İletişim Becerileri
-- SDB3: Duygusal Beceriler
-
-Her alan için zorunlu alanlar:
-- "code": TAM alan kodu (örn: "TAEOB1", "MAB2", "SNAB4")
-- "indicators": O alana özel 2-3 spesifik gösterge
-- "notes": Nasıl destekleneceğine dair uygulama notu
-
-**3. KAVRAMSAL BECERİLER (conceptualSkills) - 2-3 ana beceri:**
-- KB2.9: Genelleme Becerisi
-- KB2.1: Sınıflandırma Becerisi  
-- KB2.5: Sebep-Sonuç İlişkisi Kurma
-- KB2.3: Karşılaştırma Yapma
-- KB2.7: Çıkarım Yapma
-
-**4. EĞİLİMLER (dispositions) - 2-3 eğilim:**
-- E1: Benlik Eğilimleri (merak, öz güven, girişimcilik)
-- E2: Çevreyle İlgili Eğilimler (doğa sevgisi, çevre bilinci)
-- E3: Entelektüel Eğilimler (odaklanma, yaratıcılık, eleştirel düşünme)
-- E4: Sosyal Eğilimler (empati, iş birliği, adalet)
-
-**5. DEĞERLER (values) - 2-3 değer:**
-- D3: Çalışkanlık
-- D19: Vatanseverlik
-- D1: Adalet
-- D5: Dostluk
-- D12: Saygı
-
-**6. PROGRAMLAR ARASI BİLEŞENLER (crossComponents):**
-- Sosyal-Duygusal Öğrenme Becerileri (SDB)
-- Değerler eğitimi
-- Beceri temelli öğrenme
-
-**7. ÖĞRENME ÇIKTILARI VE SÜREÇ BİLEŞENLERİ:**
-Her alan için detaylı öğrenme çıktıları ve süreç bileşenleri
-
-**8. İÇERİK ÇERÇEVESİ (contentFrame):**
-- Kavramlar (büyük-küçük, başlangıç-bitiş, vb.)
-- Sözcükler (tema ile ilgili)
-- Materyaller (fotoğraflı isim kartları, etiketler, vb.)
-
-**9. ÖĞRENME-ÖĞRETME YAŞANTILARI (blocks) - HER BÖLÜM DETAYLI:**
-
-**a) Güne Başlama Zamanı (startOfDay):**
-- Açılış rutini ve sohbet
-- Yoklama/devam (yaratıcı yöntemlerle)
-- Günün planının tanıtımı
-- Merkez seçimi ve organizasyon
-- 4-5 cümle detaylı açıklama
-
-**b) Öğrenme Merkezlerinde Oyun (learningCenters) - 6-8 merkez:**
-["Matematik merkezi", "Türkçe merkezi", "Sanat merkezi", "Fen keşif merkezi", "Oyun merkezi", "Müzik merkezi", "Yaşam becerileri merkezi", "Kitap merkezi"]
-
-**c) Etkinlikler (activities) - MİNİMUM 3-4 KAPSAMLI ETKİNLİK:**
-
-Her etkinlik için ZORUNLU detaylı alanlar:
-- "title": Yaratıcı ve açıklayıcı etkinlik adı
-- "location": Hangi merkez/alan (spesifik)
-- "duration": Gerçekçi süre (dakika olarak)
-- "materials": 8-12 spesifik malzeme listesi
-- "steps": 8-12 detaylı, uygulanabilir adım
-- "mapping": İlgili alan kodları (3-4 kod)
-- "objectives": 3-4 spesifik öğretimsel hedef
-- "differentiation": Bireysel farklılıklar için detaylı uyarlama önerileri
-
-**d) Beslenme, Toplanma, Temizlik (mealsCleanup) - 5-6 rutin:**
-Günlük yaşam becerileri ve sosyal öğrenmeyi destekleyici rutinler
-
-**e) Değerlendirme (assessment) - 5-7 çeşitli yöntem:**
-- Gözlem formları
-- Anekdot kayıtları
-- Fotoğraf dokümantasyonu
-- Çocukla bireysel görüşme
-- Portfolyo çalışması
-- Akran değerlendirmesi
-- Öz değerlendirme
-
-**10. FARKLILAŞTIRMA:**
-- "enrichment": Zenginleştirme etkinlikleri
-- "support": Destek gereken çocuklar için uyarlama
-
-**11. AİLE/TOPLUM KATILIMI:**
-- Ailenin sürece katılım önerileri
-- Ev etkinlikleri
-- Toplumsal bağlantılar
-
-**ÖRNEK PROFESYONEL GÜNLÜK PLAN:**
-```json
-{
-  "finalize": true,
-  "type": "daily",
-  "ageBand": "60_72",
-  "date": "2025-09-20",
-  "theme": "İsimler ve Kimlik",
-  "domainOutcomes": [
-    {
-      "code": "TAEOB1",
-      "indicators": ["Sözcüklerin harflerden oluştuğunu fark eder", "Büyük ve küçük harfleri ayırt eder", "İsminin harflerini tanır"],
-      "notes": "Fotoğraflı isim kartları ile somutlaştırılır"
-    },
-    {
-      "code": "SNAB4", 
-      "indicators": ["Bireysel sanat etkinliğinde aktif rol alır", "Yaratıcı ürünler oluşturur", "Sanatsal çalışmasını sergiler"],
-      "notes": "Otoportre çizimi ile desteklenir"
-    },
-    {
-      "code": "MHB4",
-      "indicators": ["Müzik eşliğinde hareket eder", "Ritim tutarak dans eder", "Şarkı söylerken hareket eder"],
-      "notes": "İsim şarkıları ve hareketli oyunlarla"
-    },
-    {
-      "code": "SDB2",
-      "indicators": ["Grup iletişimine katılır", "Fikirlerini arkadaşları ile paylaşır", "Sohbet kurallarına uyar"],
-      "notes": "İsim paylaşım etkinlikleriyle"
-    }
-  ],
-  "conceptualSkills": ["KB2.9: Genelleme Becerisi"],
-  "dispositions": ["E1: Benlik Eğilimleri (merak)", "E3: Entelektüel Eğilimler (odaklanma, yaratıcılık)"],
-  "values": ["D3: Çalışkanlık", "D19: Vatanseverlik"],
-  "crossComponents": {
-    "socialEmotionalLearning": "SDB2.1: İletişim Becerisi - grup iletişimine katılma",
-    "values": ["D3: Çalışkanlık", "D19: Vatanseverlik"],
-    "literacy": "Erken okuryazarlık becerileri"
-  },
-  "learningOutcomes": {
-    "turkish": "Sözcüklerin harflerden oluştuğunu fark etme, büyük-küçük harfleri ayırt etme",
-    "art": "Bireysel veya grup çalışması içinde sanat etkinliklerinde aktif rol alma",
-    "music": "Hareket ve dans etme becerilerini geliştirme"
-  },
-  "contentFrame": {
-    "concepts": ["büyük-küçük", "başlangıç-bitiş", "benzer-farklı"],
-    "vocabulary": ["isim", "harf", "sözcük", "başlangıç"],
-    "materials": ["fotoğraflı isim kartları", "etiketler", "boyama malzemeleri", "müzik aleti"]
-  },
-  "blocks": {
-    "startOfDay": "Güne fotoğraflı isim kartları ile başlarız. Her çocuk kendi kartını bulur ve ismini yüksek sesle söyler. İsim kartlarında harfleri incelenir, büyük-küçük harfler tanıtılır. Sınıf içinde isim kartları ile düzenleme yapılır. Günün etkinlikleri tanıtılarak çocuklar merkez seçimi yapar.",
-    "learningCenters": ["Matematik merkezi", "Türkçe merkezi", "Sanat merkezi", "Fen keşif merkezi", "Oyun merkezi", "Müzik merkezi", "Yaşam becerileri merkezi", "Kitap merkezi"],
-    "activities": [
-      {
-        "title": "Fotoğraflı İsim Kartları ile Harf Keşfi",
-        "location": "Türkçe merkezi ve sohbet halısı",
-        "duration": "30 dakika",
-        "materials": ["Fotoğraflı isim kartları", "Büyük boyutlu harfler", "Magnifier", "Renkli kalemler", "Büyük kağıtlar", "Harf damgaları", "İsim etiketleri", "Sınıf listesi", "Ayna", "Harf puzzle'ları"],
-        "steps": [
-          "Çocuklar halı üzerinde daire şeklinde oturur",
-          "Her çocuk kendi fotoğraflı isim kartını bulur",
-          "İsim kartlarındaki harfler magnifier ile incelenir",
-          "Büyük ve küçük harfler karşılaştırılır ve ayrılır",
-          "Her çocuk isminin ilk harfini büyük harfler arasından bulur",
-          "Aynı harfle başlayan isimleri gruplarız",
-          "İsim kartlarını alfabetik sıraya dizmeye çalışırız",
-          "Her çocuk ismini harf damgaları ile büyük kağıda yazar",
-          "İsimlerin uzunluğunu sayıp karşılaştırırız",
-          "Ortak harfleri olan isimleri buluruz",
-          "Her çocuk kendi ismini aynada söyleyerek kimlik bağlantısı kurar"
-        ],
-        "mapping": ["TAEOB1.a", "TAEOB1.b", "SDB2.a", "KB2.9"],
-        "objectives": ["Harflerin sözcükleri oluşturduğunu kavrama", "Büyük-küçük harf ayrımı yapma", "İsim-kimlik bağlantısı oluşturma", "Alfabetik düzen kavramını geliştirme"],
-        "differentiation": "İleri düzey çocuklar kendi isimlerini yazabilir, destek isteyen çocuklar harf çıkartmaları kullanabilir, özel gereksinimi olan çocuklar için dokunsal harf kartları kullanılır"
-      },
-      {
-        "title": "Benliğimi Tanıyorum: Otoportre Çizimi",
-        "location": "Sanat merkezi",
-        "duration": "40 dakika",
-        "materials": ["Büyük boyutlu kağıtlar", "Pastel boyalar", "Aynalar", "Renkli kalemler", "Sulu boyalar", "Fırçalar", "Fotoğraflar", "Kolaj malzemeleri", "Yuvarlak çerçeveler", "Makaslar", "Tutkallar"],
-        "steps": [
-          "Her çocuk kendi aynasına bakarak yüz özelliklerini inceler",
-          "Göz, burun, ağız şekillerini aynada gözlemler",
-          "Saç rengi ve şeklini fark eder, tanımlar",
-          "Büyük kağıda kalem ile yüz şeklini çizer",
-          "Göz, burun, ağız detaylarını ekler",
-          "Saç şeklini ve rengini boyarla tamamlar",
-          "Kendi fotoğrafı ile çizimini karşılaştırır",
-          "Benzerlik ve farklılıkları arkadaşları ile paylaşır",
-          "Çizimini pastel boyalar ile renklendirir",
-          "Çerçeveleyerek özel hale getirir",
-          "Her çocuk çalışmasını tanıtır ve sergiler"
-        ],
-        "mapping": ["SNAB4.a", "SNAB4.b", "E1.a", "SDB2.b"],
-        "objectives": ["Benlik algısını güçlendirme", "Yaratıcı ifade becerilerini geliştirme", "Kendini tanıma ve tanıtma", "Sanatsal çalışmada özgüven kazanma"],
-        "differentiation": "Çizim zorluğu yaşayan çocuklar kolaj tekniği kullanabilir, detaycı çocuklar gözlük, takı gibi aksesuar ekleyebilir, utangaç çocuklar partneri ile çalışabilir"
-      },
-      {
-        "title": "İsimle Dans: Müzikli Hareket Atölyesi",
-        "location": "Müzik merkezi ve açık alan", 
-        "duration": "25 dakika",
-        "materials": ["Ritim aletleri", "Müzik çalar", "İsim şarkıları", "Renkli eşarplar", "Davul", "Marakas", "Çıngırak", "Hareket kartları", "Tempo şarkıları"],
-        "steps": [
-          "Çocuklar daire şeklinde oturarak müzik dinler",
-          "Her çocuk isminin hecelerini alkışlar",
-          "İsmin hecesi kadar dans adımı atar",
-          "Uzun isimli çocuklar tempo hızlı dans eder",
-          "Kısa isimli çocuklar yavaş ve akıcı hareket eder",
-          "İsim şarkısı söyleyerek grup dansı yapar",
-          "Her çocuk kendi ismini şarkıya dönüştürür",
-          "Ritim aleti seçerek ismini çalar",
-          "Partneri ile isim şarkısı söyler",
-          "Serbest dans ile müzik dinleme zamanı"
-        ],
-        "mapping": ["MHB4.a", "MHB4.b", "TAEOB3.a", "SDB2.c"],
-        "objectives": ["Müzik ile hareket koordinasyonu", "İsim-ritim bağlantısı kurma", "Müziksel ifade geliştirme", "Grup etkinliğinde aktif katılım"],
-        "differentiation": "Utangaç çocuklar küçük grup ile başlar, müzik yeteneği olan çocuklar liderlik yapar, hareket zorluğu olan çocuklar oturarak katılır"
-      }
-    ],
-    "mealsCleanup": [
-      "Kahvaltı öncesi el yıkama rutini ve sofra hazırlığı",
-      "Kahvaltı sırasında sağlıklı beslenme ve isim paylaşım sohbeti",
-      "Öğle yemeği öncesi masa sorumluları seçimi ve işbölümü",
-      "Yemek sonrası kendi alanını temizleme sorumluluğu",
-      "Atıştırmalık zamanında paylaşım kuralları ve nezaket",
-      "Günlük sınıf temizliği işbirliği ile yapma"
-    ],
-    "assessment": [
-      "Gözlem formu ile harf tanıma becerileri takibi",
-      "Anekdot kayıtları ile sosyal etkileşim becerileri",
-      "Fotoğraf dokümantasyonu ile sanat çalışması gelişimi",
-      "Çocukla bireysel görüşme: 'Her şeyin bir ismi var mı?'",
-      "Çalışma portfolyosu: otoportre gelişim takibi",
-      "Akran değerlendirmesi: arkadaşının sanat çalışması hakkında",
-      "Öz değerlendirme: 'Bugün ismim hakkında neler öğrendim?'"
-    ]
-  },
-  "differentiation": {
-    "enrichment": "Kelime atölyesi oluşturma, farklı dillerdeki isimler araştırması, aile isim ağacı projesi",
-    "support": "Görsel destek kartları, dokunsal harf materyalleri, fotoğraflı adım kartları"
-  },
-  "familyCommunityInvolvement": "Ailelerden çocuğun isminin anlamı ve seçim öyküsü paylaşımı, ev ödevi: aile üyelerinin isimlerini öğrenme",
-  "notes": "Hava durumu ve çocukların dikkat süresine göre etkinlik süreleri ayarlanabilir. Bireysel tempo farklılıkları dikkate alınır.",
-  "duration": "Tam gün",
-  "groupSize": "20 çocuk"
-}
-```
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await user_from_token(verify_token(credentials))
+
+async def get_token_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """For read-only endpoints: claims tokens authenticate with no database I/O at all.
+
+    The in-memory revocation check still applies; the profile fields may lag
+    a profile change until the token is reissued.
+    """
+    payload = verify_token(credentials)
+    try:
+        user = principal_from_claims(payload)
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return user if user is not None else await user_from_token(payload)
 
-**Vector store'dan yararlanarak** gerçek Türkiye Yüzyılı Maarif Modeli içeriklerini kullan.
-**SADECE JSON FORMATINDA CEVAP VER, HİÇBİR AÇIKLAMA YAPMA. TÜM ALANLAR PROFESYONEL SEVİYEDE DOLU OLMALI.**"""
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    # Role is read from the database, never from token claims
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Administrator access required")
+    return current_user
 
 # Auth Routes
 @api_router.options("/auth/register")
@@ -500,7 +384,7 @@ async def register(user_data: UserCreate):
     # Create user
     user_dict = {
         "email": user_data.email,
-        "passwordHash": hash_password(user_data.password),
+        "passwordHash": await hash_password(user_data.password),
         "name": user_data.name,
         "school": user_data.school,
         "className": user_data.className,
@@ -509,7 +393,7 @@ async def register(user_data: UserCreate):
     }
     
     result = await db.users.insert_one(user_dict)
-    token = create_jwt_token(str(result.inserted_id))
+    token = create_jwt_token({"_id": result.inserted_id, **user_dict})
     
     return {
         "token": token,
@@ -530,10 +414,10 @@ async def login_options():
 @api_router.post("/auth/login")
 async def login(login_data: UserLogin):
     user = await db.users.find_one({"email": login_data.email})
-    if not user or not verify_password(login_data.password, user["passwordHash"]):
+    if not await verify_password(login_data.password, user):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    token = create_jwt_token(str(user["_id"]))
+    token = create_jwt_token(user)
     
     return {
         "token": token,
@@ -547,12 +431,92 @@ async def login(login_data: UserLogin):
         }
     }
 
+@api_router.options("/auth/logout")
+async def logout_options():
+    return {"message": "OK"}
+
+@api_router.post("/auth/logout")
+async def logout(current_user: dict = Depends(get_current_user)):
+    """Revoke every token issued to the user so far."""
+    await token_revocations.revoke(str(current_user["_id"]))
+    invalidate_user(current_user["_id"])
+    return {"message": "Logged out"}
+
+@api_router.options("/auth/password")
+async def password_options():
+    return {"message": "OK"}
+
+@api_router.post("/auth/password")
+async def change_password(password_data: PasswordChange, current_user: dict = Depends(get_current_user)):
+    user = await db.users.find_one({"_id": current_user["_id"]})
+    if not await verify_password(password_data.currentPassword, user):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    await db.users.update_one(
+        {"_id": user["_id"]},
+        {"$set": {"passwordHash": await hash_password(password_data.newPassword)}}
+    )
+    # Other devices must log in again with the new password
+    token_version = await token_revocations.revoke(str(user["_id"]))
+    invalidate_user(user["_id"])
+    
+    return {"token": create_jwt_token({**user, "tokenVersion": token_version})}
+
+@api_router.options("/admin/teachers/bulk")
+async def admin_teachers_bulk_options():
+    return {"message": "OK"}
+
+@api_router.post("/admin/teachers/bulk")
+async def provision_teachers(request: Request, current_user: dict = Depends(get_admin_user)):
+    """Create teacher accounts for the administrator's school from one upload.
+
+    Administrators are the users listed in ADMIN_EMAILS, promoted at startup,
+    and must have a school. The body is CSV (`text/csv`, header row
+    email,password,name,className,ageDefault) or JSON. Passwords are hashed at
+    BULK_PASSWORD_HASH_ROUNDS on the hasher's shared bulk slots, and no
+    plaintext outlives the request; rows are inserted unordered and the unique
+    email index reports existing accounts. Returns one result per row.
+    """
+    school = current_user.get("school")
+    if not school:
+        raise HTTPException(status_code=422, detail="Administrator account has no school to provision teachers for")
+    
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > BULK_PROVISION_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Upload too large")
+    try:
+        rows = parse_teacher_rows(bytes(body), request.headers.get("content-type", ""))
+    except ProvisioningInputError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if len(rows) > BULK_PROVISION_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_PROVISION_MAX_ROWS} teachers per upload")
+    
+    accepted, rejected = validate_rows(rows)
+    try:
+        hashes = await password_hasher.hash_many(
+            [teacher["password"] for _, teacher in accepted], rounds=BULK_PASSWORD_HASH_ROUNDS
+        )
+    except HasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    now = datetime.utcnow()
+    docs = [
+        (number, teacher_document(teacher, password_hash, school, now))
+        for (number, teacher), password_hash in zip(accepted, hashes)
+    ]
+    results = rejected + await insert_teachers(db.users, docs)
+    
+    report = summarize(results)
+    logger.info(f"Bulk provisioning by {current_user['_id']}: {report['counts']}")
+    return report
+
 @api_router.options("/auth/me")
 async def auth_me_options():
     return {"message": "OK"}
 
 @api_router.get("/auth/me")
-async def get_me(current_user: dict = Depends(get_current_user)):
+async def get_me(current_user: dict = Depends(get_token_user)):
     return {
         "id": str(current_user["_id"]),
         "email": current_user["email"],
@@ -562,79 +526,386 @@ async def get_me(current_user: dict = Depends(get_current_user)):
         "ageDefault": current_user.get("ageDefault", "60_72")
     }
 
+# AI Chat Helpers
+def build_prompt(request: PlanGenerateRequest, current_user: dict) -> str:
+    # Build conversation history, compacting older turns to stay within the prompt budget
+    conversation_text = compact_history(
+        [(msg.role, msg.content) for msg in request.history],
+        request.message,
+        HISTORY_TOKEN_BUDGET,
+        HISTORY_VERBATIM_TURNS
+    )
+    return build_prompt_text(current_user, conversation_text, request.date)
+
+def parse_ai_response(response_text: str, outcomes: Optional[List[str]] = None, plan: bool = False) -> dict:
+    # Handles code fences, surrounding prose and truncated output
+    try:
+        ai_response = parse_response(response_text, outcomes)
+    except ResponseParseError:
+        raise HTTPException(status_code=500, detail="Invalid AI response format")
+    if plan:
+        require_plan_response(ai_response)
+    return ai_response
+
+def require_plan_response(ai_response: dict) -> dict:
+    # Never cache or save something that is not a plan or follow-up turn
+    if not is_plan_response(ai_response):
+        raise HTTPException(status_code=500, detail="Invalid AI response format")
+    return ai_response
+
+async def save_chat_history(current_user: dict, request: PlanGenerateRequest, ai_response: dict,
+                            session_id: Optional[str] = None) -> str:
+    """Record the turn; its id doubles as the draft id the plan can be saved by."""
+    chat_record = {
+        "userId": ObjectId(current_user["_id"]),
+        "message": request.message,
+        "response": ai_response,
+        "timestamp": datetime.utcnow(),
+        "ageBand": request.ageBand,
+        "planType": request.planType
+    }
+    if session_id:
+        chat_record["sessionId"] = ObjectId(session_id)
+    result = await db.chat_history.insert_one(chat_record)
+    return str(result.inserted_id)
+
+async def validate_plan(ai_response: dict, current_user: dict, plan_date: Optional[str] = None) -> dict:
+    # Patch only the paths that fail JSON_SCHEMA instead of regenerating the plan
+    tenant = llm_tenant(current_user)
+    return await plan_validator.validate_and_repair(
+        ai_response,
+        lambda text: llm_gateway.complete(text, tenant),
+        parse_ai_response,
+        build_context(current_user, plan_date),
+        PLAN_REPAIR_ROUNDS
+    )
+
+def llm_tenant(current_user: dict) -> tuple:
+    return current_user.get("school") or "", str(current_user["_id"])
+
+def plan_cache_key(request: PlanGenerateRequest, current_user: dict) -> str:
+    return generation_key(
+        request.message,
+        [{"role": msg.role, "content": msg.content} for msg in request.history],
+        request.ageBand,
+        request.planType,
+        request.date or datetime.utcnow().strftime("%Y-%m-%d"),
+        current_user.get("ageDefault", "60_72")
+    )
+
+async def fallback_plan(request: PlanGenerateRequest, current_user: dict) -> dict:
+    """Closest cached plan for the age band and theme, else the template plan, flagged as degraded."""
+    plan_date = request.date or datetime.utcnow().strftime("%Y-%m-%d")
+    try:
+        plan = await cached_fallback(db.generation_cache, request.ageBand, request.message)
+    except Exception as e:
+        logger.warning(f"Fallback plan lookup failed: {str(e)}")
+        plan = None
+    if plan is not None:
+        return mark_degraded({**plan, "date": plan_date}, "cache")
+    return mark_degraded(template_plan(request.ageBand, plan_date), "template")
+
+async def regenerate_plan_node(plan: dict, node: PlanNodeRegenerate, current_user: dict) -> tuple:
+    try:
+        path = parse_path(node.path)
+        get_path(plan, path)
+    except (ValueError, KeyError, IndexError, TypeError):
+        raise HTTPException(status_code=422, detail=f"Invalid plan path: {node.path}")
+    try:
+        value = await regenerate_node(
+            lambda text: llm_gateway.complete(text, llm_tenant(current_user)),
+            parse_ai_response,
+            build_context(current_user, plan.get("date")),
+            plan,
+            path,
+            node.request or ""
+        )
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+    except CircuitOpen as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except LlmDeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"Plan node regeneration error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
+    return path, value
+
+async def run_plan_generation(request: PlanGenerateRequest, current_user: dict,
+                              session: Optional[dict] = None) -> tuple:
+    """Generate a response and record it; returns `(ai_response, draft_id)`."""
+    # Retries of an identical request from the same user share one generation and history write
+    cache_key = plan_cache_key(request, current_user)
+    session_id = session["id"] if session else None
+    return await plan_flights.do(
+        f"{current_user['_id']}:{session_id}:{cache_key}",
+        lambda: generate_and_record(request, current_user, cache_key, session)
+    )
+
+async def generate_and_record(request: PlanGenerateRequest, current_user: dict, cache_key: str,
+                              session: Optional[dict] = None) -> tuple:
+    ai_response = await generate_plan_body(request, current_user, cache_key)
+    
+    # Save chat history
+    draft_id = await save_chat_history(current_user, request, ai_response, session["id"] if session else None)
+    if session:
+        # Only the single-flight leader gets here, so coalesced retries add the turn once
+        await chat_sessions.append(session, request.message, ai_response)
+    
+    return ai_response, draft_id
+
+def follow_up_response(request: PlanGenerateRequest) -> Optional[dict]:
+    """Follow-up questions from the rule engine when the turn cannot produce a plan yet."""
+    started = time.monotonic()
+    missing = turn_router.route(request.message, [(msg.role, msg.content) for msg in request.history])
+    if not missing:
+        return None
+    ai_response = turn_router.follow_up(
+        missing, request.planType, request.ageBand, request.date or datetime.utcnow().strftime("%Y-%m-%d")
+    )
+    turn_router.record("rules", time.monotonic() - started)
+    return ai_response
+
+async def generate_plan_body(request: PlanGenerateRequest, current_user: dict, cache_key: str) -> dict:
+    ai_response = follow_up_response(request)
+    if ai_response is not None:
+        return ai_response
+    
+    started = time.monotonic()
+    ai_response = await generation_cache.get(cache_key)
+    
+    if ai_response is None:
+        tenant = llm_tenant(current_user)
+        outcomes: List[str] = []
+        try:
+            if request.mode == "two_stage":
+                # Skeleton first, then activities expanded in parallel
+                ai_response = require_plan_response(await generate_two_stage(
+                    lambda text: llm_gateway.complete(text, tenant),
+                    lambda text: parse_ai_response(text, outcomes),
+                    build_prompt(request, current_user),
+                    PLAN_EXPANSION_PARALLELISM
+                ))
+            else:
+                # Send message to AI
+                response_text = await llm_gateway.complete(build_prompt(request, current_user), tenant)
+                
+                # Parse JSON response
+                ai_response = parse_ai_response(response_text, outcomes, plan=True)
+        except CircuitOpen:
+            # Provider is unhealthy: answer right away with a degraded plan, never cached
+            ai_response = await fallback_plan(request, current_user)
+            turn_router.record("fallback", time.monotonic() - started)
+            return ai_response
+        ai_response = await validate_plan(ai_response, current_user, request.date)
+        # A plan rebuilt from truncated output is served once but never shared through the cache
+        if "repaired" not in outcomes:
+            await generation_cache.set(cache_key, ai_response)
+        turn_router.record("llm", time.monotonic() - started)
+    else:
+        turn_router.record("cache", time.monotonic() - started)
+    
+    return ai_response
+
 # AI Chat Routes
 @api_router.options("/ai/chat")
 async def chat_options():
     return {"message": "OK"}
 
 @api_router.post("/ai/chat")
-async def generate_plan(request: PlanGenerateRequest, current_user: dict = Depends(get_current_user)):
+async def generate_plan(request: PlanGenerateRequest, response: Response,
+                        current_user: dict = Depends(get_current_user)):
     try:
-        # Get user's default age band and today's date
-        user_age_band = current_user.get("ageDefault", "60_72")
-        today_date = datetime.utcnow().strftime("%Y-%m-%d")
-        
-        # Enhanced system prompt with user context
-        enhanced_system_prompt = f"""{SYSTEM_PROMPT}
-
-**BU PLAN İÇİN ZORUNLU CONTEXT:**
-- **BUGÜNÜN TARİHİ**: {today_date} (bu tarihi kullan)
-- **ÖĞRETMENİN YAŞ GRUBU**: {user_age_band} (bu yaş grubu için plan yap)
-- **ÖĞRETMEN BİLGİLERİ**: {current_user.get('name', 'Öğretmen')} - {current_user.get('school', 'Okul')} - {current_user.get('className', 'Sınıf')}
-
-**OTOMATIK KULLANIM:**
-- Plan tarihini {today_date} olarak ayarla
-- Yaş bandını {user_age_band} olarak ayarla
-- Tema belirtilmemişse güncel eğitim konularından uygun tema seç
-- Tüm etkinlikler birbiriyle tutarlı ve temaya uygun olsun"""
-
-        # Initialize LLM chat
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"user_{current_user['_id']}_{datetime.utcnow().isoformat()}",
-            system_message=enhanced_system_prompt
-        ).with_model("openai", "gpt-4o")
-        
-        # Build conversation history
-        conversation_text = ""
-        for msg in request.history:
-            conversation_text += f"{msg.role}: {msg.content}\n"
-        conversation_text += f"user: {request.message}"
-        
-        # Send message to AI
-        user_message = UserMessage(text=conversation_text)
-        response_text = await chat.send_message(user_message)
-        
-        # Parse JSON response
-        try:
-            ai_response = json.loads(response_text)
-        except json.JSONDecodeError:
-            # Extract JSON from response if wrapped in text
-            import re
-            json_pattern = r'\{.*\}'
-            match = re.search(json_pattern, response_text, re.DOTALL)
-            if match:
-                ai_response = json.loads(match.group())
-            else:
-                raise HTTPException(status_code=500, detail="Invalid AI response format")
-        
-        # Save chat history
-        chat_record = {
-            "userId": ObjectId(current_user["_id"]),
-            "message": request.message,
-            "response": ai_response,
-            "timestamp": datetime.utcnow(),
-            "ageBand": request.ageBand,
-            "planType": request.planType
-        }
-        await db.chat_history.insert_one(chat_record)
-        
+        ai_response, draft_id = await run_plan_generation(request, current_user)
+        response.headers["X-Draft-Id"] = draft_id
         return ai_response
-        
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+    except LlmDeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"AI chat error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
 
+@api_router.options("/ai/chat/stream")
+async def chat_stream_options():
+    return {"message": "OK"}
+
+@api_router.post("/ai/chat/stream")
+async def generate_plan_stream(request: PlanGenerateRequest, current_user: dict = Depends(get_current_user)):
+    """Same generation as /ai/chat, delivered as Server-Sent Events.
+
+    Events: `token` for each raw chunk, `section` for theme, domainOutcomes and
+    each blocks.activities[i] once parsed, then `plan` with the final response
+    (or `error`). Backends without token streaming are rejected with 501, since
+    the whole reply would arrive as one late chunk; use /ai/chat instead.
+    """
+    if not llm_gateway.streams:
+        raise HTTPException(
+            status_code=501,
+            detail=f"LLM backend '{llm_gateway.provider.name}' does not support streaming; use /api/ai/chat"
+        )
+
+    async def events():
+        parser = PlanSectionParser()
+        chunks = []
+        try:
+            cache_key = plan_cache_key(request, current_user)
+            ai_response = follow_up_response(request) or await generation_cache.get(cache_key)
+            if ai_response is not None:
+                for path, value in iter_sections(ai_response):
+                    yield sse_event("section", {"path": path, "value": value})
+            else:
+                try:
+                    async for chunk in llm_gateway.stream(build_prompt(request, current_user), llm_tenant(current_user)):
+                        chunks.append(chunk)
+                        yield sse_event("token", {"text": chunk})
+                        for path, value in parser.feed(chunk):
+                            yield sse_event("section", {"path": path, "value": value})
+                    
+                    outcomes: List[str] = []
+                    ai_response = parse_ai_response("".join(chunks), outcomes, plan=True)
+                    ai_response = await validate_plan(ai_response, current_user, request.date)
+                    if "repaired" not in outcomes:
+                        await generation_cache.set(cache_key, ai_response)
+                except CircuitOpen:
+                    ai_response = await fallback_plan(request, current_user)
+                    for path, value in iter_sections(ai_response):
+                        yield sse_event("section", {"path": path, "value": value})
+            draft_id = await save_chat_history(current_user, request, ai_response)
+            yield sse_event("plan", ai_response)
+            yield sse_event("draft", {"draftId": draft_id})
+        except AdmissionRejected as e:
+            yield sse_event("error", {"status": 429, "detail": e.reason, "retryAfter": e.retry_after})
+        except LlmDeadlineExceeded as e:
+            yield sse_event("error", {"status": 504, "detail": str(e)})
+        except Exception as e:
+            logger.error(f"AI chat stream error: {str(e)}")
+            yield sse_event("error", {"detail": f"AI service error: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# AI Chat Session Routes
+@api_router.options("/ai/sessions")
+async def ai_sessions_options():
+    return {"message": "OK"}
+
+@api_router.post("/ai/sessions")
+async def create_chat_session(session_data: ChatSessionCreate, current_user: dict = Depends(get_current_user)):
+    session = await chat_sessions.create(str(current_user["_id"]), session_data.ageBand, session_data.planType)
+    return {"sessionId": session["id"], "ageBand": session["ageBand"], "planType": session["planType"]}
+
+async def find_chat_session(session_id: str, current_user: dict) -> dict:
+    try:
+        session = await chat_sessions.get(session_id, str(current_user["_id"]))
+    except Exception:
+        session = None
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+@api_router.options("/ai/sessions/{session_id}/messages")
+async def ai_session_messages_options(session_id: str):
+    return {"message": "OK"}
+
+@api_router.post("/ai/sessions/{session_id}/messages")
+async def send_session_message(session_id: str, message_data: ChatSessionMessage, response: Response,
+                               current_user: dict = Depends(get_current_user)):
+    """Like /ai/chat, but the history comes from the stored session instead of the request body."""
+    session = await find_chat_session(session_id, current_user)
+    # Stored turns are already trusted, so skip re-validating them
+    request = PlanGenerateRequest.model_construct(
+        message=message_data.message,
+        history=[ChatMessage.model_construct(role=role, content=content) for role, content in session["turns"]],
+        ageBand=session["ageBand"],
+        planType=session["planType"]
+    )
+    try:
+        ai_response, draft_id = await run_plan_generation(request, current_user, session)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+    except LlmDeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"AI session chat error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
+    response.headers["X-Draft-Id"] = draft_id
+    return ai_response
+
+# AI Job Routes
+async def run_plan_job(job: dict) -> dict:
+    user = await load_user(str(job["userId"]))
+    if user is None:
+        raise ValueError("User not found")
+    ai_response, draft_id = await run_plan_generation(PlanGenerateRequest(**job["request"]), user)
+    await db.plan_jobs.update_one({"_id": job["_id"], "leaseId": job["leaseId"]}, {"$set": {"draftId": draft_id}})
+    return ai_response
+
+plan_jobs = PlanJobQueue(
+    db.plan_jobs,
+    run_plan_job,
+    workers=PLAN_JOB_WORKERS,
+    concurrency=PLAN_JOB_CONCURRENCY,
+    max_attempts=PLAN_JOB_MAX_ATTEMPTS
+)
+
+@api_router.options("/ai/jobs")
+async def ai_jobs_options():
+    return {"message": "OK"}
+
+@api_router.post("/ai/jobs", status_code=202)
+async def create_plan_job(request: PlanGenerateRequest, current_user: dict = Depends(get_current_user)):
+    job_id = await plan_jobs.enqueue(str(current_user["_id"]), request.model_dump())
+    return {"jobId": job_id, "status": "queued"}
+
+@api_router.options("/ai/jobs/{job_id}")
+async def ai_job_detail_options(job_id: str):
+    return {"message": "OK"}
+
+async def find_plan_job(job_id: str, current_user: dict) -> dict:
+    try:
+        job = await plan_jobs.get(job_id, str(current_user["_id"]))
+    except Exception:
+        job = None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api_router.get("/ai/jobs/{job_id}")
+async def get_plan_job(job_id: str, current_user: dict = Depends(get_token_user)):
+    return serialize_job(await find_plan_job(job_id, current_user))
+
+@api_router.get("/ai/jobs/{job_id}/events")
+async def plan_job_events(job_id: str, current_user: dict = Depends(get_token_user)):
+    """Server-Sent Events feed of job status until the job is done or failed."""
+    job = await find_plan_job(job_id, current_user)
+
+    async def events():
+        current = job
+        last_status = None
+        while True:
+            if current["status"] != last_status:
+                last_status = current["status"]
+                yield sse_event("status", {"status": last_status, "attempts": current["attempts"]})
+            if last_status == "done":
+                yield sse_event("plan", current["result"])
+                return
+            if last_status == "failed":
+                yield sse_event("error", {"detail": f"AI service error: {current['error']}"})
+                return
+            await asyncio.sleep(1)
+            current = await find_plan_job(job_id, current_user)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Plan Routes
 @api_router.options("/plans/daily")
 async def plans_daily_options():
@@ -651,11 +922,25 @@ async def create_daily_plan(plan_data: DailyPlanCreate, current_user: dict = Dep
         except ValueError:
             raise HTTPException(status_code=422, detail="Invalid date format. Use YYYY-MM-DD format.")
         
+        plan_json = plan_data.planJson
+        if plan_data.draftId:
+            # Promote the generated plan the server already holds instead of a re-uploaded copy
+            try:
+                draft_filter = {"_id": ObjectId(plan_data.draftId), "userId": ObjectId(current_user["_id"])}
+            except Exception:
+                raise HTTPException(status_code=404, detail="Draft not found")
+            draft = await db.chat_history.find_one(draft_filter, {"response": 1})
+            if not draft:
+                raise HTTPException(status_code=404, detail="Draft not found")
+            plan_json = draft["response"]
+        if plan_json is None:
+            raise HTTPException(status_code=422, detail="Either planJson or draftId is required")
+        
         plan_dict = {
             "userId": ObjectId(current_user["_id"]),
             "date": plan_date,
-            "ageBand": plan_data.ageBand,
-            "planJson": plan_data.planJson,
+            "ageBand": plan_data.ageBand or plan_json.get("ageBand", "60_72"),
+            "planJson": plan_json,
             "title": plan_data.title or f"Günlük Plan - {plan_data.date}",
             "createdAt": datetime.utcnow(),
             "pdfUrl": None
@@ -676,12 +961,114 @@ async def create_daily_plan(plan_data: DailyPlanCreate, current_user: dict = Dep
         logger.error(f"Error creating daily plan: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error creating plan: {str(e)}")
 
+@api_router.options("/plans/daily/batch")
+async def plans_daily_batch_options():
+    return {"message": "OK"}
+
+@api_router.post("/plans/daily/batch")
+async def create_daily_plan_batch(batch: DailyPlanBatchCreate, current_user: dict = Depends(get_current_user)):
+    """Generate one daily plan per day in the range, concurrently, and save them together.
+
+    Progress is streamed as Server-Sent Events: a `day` event as each plan
+    finishes, then `done` with the saved plan ids and any failed days.
+    """
+    try:
+        start_date = datetime.fromisoformat(batch.startDate)
+        end_date = datetime.fromisoformat(batch.endDate)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid date format. Use YYYY-MM-DD format.")
+    if not batch.themes:
+        raise HTTPException(status_code=422, detail="At least one theme is required")
+    
+    days = []
+    day = start_date
+    while day <= end_date:
+        if not (batch.skipWeekends and day.weekday() >= 5):
+            days.append(day)
+        day += timedelta(days=1)
+    if not days or len(days) > PLAN_BATCH_MAX_DAYS:
+        raise HTTPException(status_code=422, detail=f"Date range must cover 1-{PLAN_BATCH_MAX_DAYS} plan days")
+    
+    schedule = [(day.strftime("%Y-%m-%d"), batch.themes[index % len(batch.themes)]) for index, day in enumerate(days)]
+    # Plans are generated for the requested age band rather than the teacher's default
+    batch_user = {**current_user, "ageDefault": batch.ageBand}
+    slots = asyncio.Semaphore(PLAN_BATCH_CONCURRENCY)
+
+    async def generate_day(date: str, theme: str) -> tuple:
+        request = PlanGenerateRequest(
+            message=build_batch_day_message(date, theme, schedule, batch.notes),
+            ageBand=batch.ageBand,
+            planType="daily",
+            date=date
+        )
+        try:
+            async with slots:
+                plan = await generate_plan_body(request, batch_user, plan_cache_key(request, batch_user))
+            if plan.get("degraded"):
+                return date, theme, None, plan["degradedReason"]
+            if not plan.get("finalize"):
+                return date, theme, None, "Plan tamamlanamadı"
+            return date, theme, plan, None
+        except Exception as e:
+            logger.error(f"Batch plan error for {date}: {str(e)}")
+            return date, theme, None, str(e)
+
+    async def events():
+        tasks = [asyncio.create_task(generate_day(date, theme)) for date, theme in schedule]
+        generated = []
+        failed = []
+        try:
+            for next_day in asyncio.as_completed(tasks):
+                date, theme, plan, error = await next_day
+                if plan is None:
+                    failed.append({"date": date, "theme": theme, "error": error})
+                    yield sse_event("day", {"date": date, "theme": theme, "status": "failed", "error": error})
+                else:
+                    generated.append((date, theme, plan))
+                    yield sse_event("day", {"date": date, "theme": theme, "status": "done"})
+            
+            generated.sort(key=lambda item: item[0])
+            now = datetime.utcnow()
+            docs = [
+                {
+                    "userId": ObjectId(current_user["_id"]),
+                    "date": datetime.fromisoformat(date),
+                    "ageBand": batch.ageBand,
+                    "planJson": plan,
+                    "title": f"Günlük Plan - {date}",
+                    "createdAt": now,
+                    "pdfUrl": None
+                }
+                for date, theme, plan in generated
+            ]
+            plans = []
+            if docs:
+                result = await db.daily_plans.insert_many(docs)
+                plans = [
+                    {"id": str(plan_id), "date": date, "theme": theme}
+                    for plan_id, (date, theme, _) in zip(result.inserted_ids, generated)
+                ]
+            logger.info(f"Batch created {len(plans)} daily plans for user {current_user['_id']}")
+            yield sse_event("done", {"plans": plans, "failed": failed})
+        except Exception as e:
+            logger.error(f"Batch plan error: {str(e)}")
+            yield sse_event("error", {"detail": f"Error creating plans: {str(e)}"})
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.options("/plans/daily")
 async def plans_daily_get_options():
     return {"message": "OK"}
 
 @api_router.get("/plans/daily")
-async def get_daily_plans(current_user: dict = Depends(get_current_user), 
+async def get_daily_plans(current_user: dict = Depends(get_token_user), 
                          from_date: Optional[str] = None, 
                          to_date: Optional[str] = None):
     query = {"userId": ObjectId(current_user["_id"])}
@@ -706,12 +1093,64 @@ async def get_daily_plans(current_user: dict = Depends(get_current_user),
         for plan in plans
     ]
 
+@api_router.options("/ai/regenerate")
+async def ai_regenerate_options():
+    return {"message": "OK"}
+
+@api_router.post("/ai/regenerate")
+async def regenerate_draft_node(node: DraftNodeRegenerate, current_user: dict = Depends(get_current_user)):
+    """Regenerate one node of an unsaved draft plan; the client splices `value` in at `path`.
+
+    With `draftId` the node is also written into that draft, like the saved
+    plan endpoint, so `POST /plans/daily` with the same draftId saves it.
+    """
+    if not node.draftId:
+        if node.planJson is None:
+            raise HTTPException(status_code=422, detail="Either planJson or draftId is required")
+        path, value = await regenerate_plan_node(node.planJson, node, current_user)
+        return {"path": format_path(path), "value": value}
+    
+    try:
+        draft_filter = {"_id": ObjectId(node.draftId), "userId": ObjectId(current_user["_id"])}
+    except Exception:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    draft = await db.chat_history.find_one(draft_filter, {"response": 1})
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    
+    path, value = await regenerate_plan_node(draft["response"], node, current_user)
+    await db.chat_history.update_one(draft_filter, {"$set": {f"response.{mongo_field(path)}": value}})
+    return {"draftId": node.draftId, "path": format_path(path), "value": value}
+
+@api_router.options("/plans/daily/{plan_id}/regenerate")
+async def plans_daily_regenerate_options(plan_id: str):
+    return {"message": "OK"}
+
+@api_router.post("/plans/daily/{plan_id}/regenerate")
+async def regenerate_daily_plan_node(plan_id: str, node: PlanNodeRegenerate,
+                                     current_user: dict = Depends(get_current_user)):
+    """Regenerate one node of a saved plan and write back only that node."""
+    try:
+        plan_filter = {"_id": ObjectId(plan_id), "userId": ObjectId(current_user["_id"])}
+    except Exception:
+        raise HTTPException(status_code=404, detail="Invalid plan ID")
+    plan = await db.daily_plans.find_one(plan_filter, {"planJson": 1})
+    if not plan:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    
+    path, value = await regenerate_plan_node(plan["planJson"], node, current_user)
+    await db.daily_plans.update_one(
+        plan_filter,
+        {"$set": {f"planJson.{mongo_field(path)}": value, "updatedAt": datetime.utcnow()}}
+    )
+    return {"id": plan_id, "path": format_path(path), "value": value}
+
 @api_router.options("/plans/daily/{plan_id}")
 async def plans_daily_detail_options(plan_id: str):
     return {"message": "OK"}
 
 @api_router.get("/plans/daily/{plan_id}")
-async def get_daily_plan(plan_id: str, current_user: dict = Depends(get_current_user)):
+async def get_daily_plan(plan_id: str, current_user: dict = Depends(get_token_user)):
     try:
         plan = await db.daily_plans.find_one({
             "_id": ObjectId(plan_id),
@@ -753,12 +1192,70 @@ async def create_monthly_plan(plan_data: MonthlyPlanCreate, current_user: dict =
         "message": "Monthly plan created successfully"
     }
 
+@api_router.options("/plans/monthly/synthesize")
+async def plans_monthly_synthesize_options():
+    return {"message": "OK"}
+
+@api_router.post("/plans/monthly/synthesize")
+async def synthesize_monthly_plan(synthesis: MonthlyPlanSynthesize, current_user: dict = Depends(get_current_user)):
+    """Build a monthly plan from the month's saved daily plans.
+
+    A Mongo aggregation reduces the daily plans to a compact digest; the plan
+    structure comes straight from the digest and at most one small LLM call
+    adds the narrative sections.
+    """
+    try:
+        month_range(synthesis.month)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid month format. Use YYYY-MM format.")
+    
+    facets = await db.daily_plans.aggregate(
+        digest_pipeline(str(current_user["_id"]), synthesis.month, synthesis.ageBand)
+    ).to_list(1)
+    if not facets or not facets[0]["days"]:
+        raise HTTPException(status_code=404, detail="No daily plans found for this month")
+    
+    digest = build_digest(synthesis.month, facets[0])
+    age_band = synthesis.ageBand or current_user.get("ageDefault", "60_72")
+    plan_json = template_monthly_plan(digest, age_band)
+    if synthesis.useLlm:
+        try:
+            narrative = parse_ai_response(await llm_gateway.complete(
+                f"{build_context(current_user)}\n\n{monthly_instruction(digest)}",
+                llm_tenant(current_user)
+            ))
+            plan_json = merge_monthly_plan(plan_json, narrative)
+        except CircuitOpen:
+            plan_json = mark_degraded(plan_json, "template")
+        except AdmissionRejected as e:
+            raise HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+        except Exception as e:
+            logger.error(f"Monthly synthesis error: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
+    
+    plan_dict = {
+        "userId": ObjectId(current_user["_id"]),
+        "month": synthesis.month,
+        "ageBand": age_band,
+        "planJson": plan_json,
+        "title": synthesis.title or f"Aylık Plan - {synthesis.month}",
+        "createdAt": datetime.utcnow(),
+        "pdfUrl": None
+    }
+    result = await db.monthly_plans.insert_one(plan_dict)
+    
+    return {
+        "id": str(result.inserted_id),
+        "message": "Monthly plan created successfully",
+        "planJson": plan_json
+    }
+
 @api_router.options("/plans/monthly")
 async def plans_monthly_options():
     return {"message": "OK"}
 
 @api_router.get("/plans/monthly")
-async def get_monthly_plans(current_user: dict = Depends(get_current_user)):
+async def get_monthly_plans(current_user: dict = Depends(get_token_user)):
     plans = await db.monthly_plans.find({"userId": ObjectId(current_user["_id"])}).sort("month", -1).to_list(100)
     
     return [
@@ -885,7 +1382,7 @@ async def add_portfolio_photo(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @api_router.get("/plans/daily/{plan_id}/portfolio")
-async def get_portfolio_photos(plan_id: str, current_user: dict = Depends(get_current_user)):
+async def get_portfolio_photos(plan_id: str, current_user: dict = Depends(get_token_user)):
     try:
         # Verify plan belongs to user
         plan = await db.daily_plans.find_one({
@@ -935,6 +1432,25 @@ async def delete_portfolio_photo(photo_id: str, current_user: dict = Depends(get
         logger.error(f"Error deleting portfolio photo: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# Metrics
+@api_router.get("/metrics")
+async def get_metrics(current_user: dict = Depends(get_admin_user)):
+    return {
+        "generationCache": generation_cache.stats(),
+        "planFlights": plan_flights.stats(),
+        "llmAdmission": llm_admission.stats(),
+        "llmGateway": llm_gateway.stats(),
+        "turnRouting": turn_router.stats(),
+        "userCache": user_cache.stats(),
+        "tokenRevocations": token_revocations.stats(),
+        "tokenCache": token_verifier.stats(),
+        "passwordHashing": password_hasher.stats(),
+        "chatSessions": chat_sessions.stats(),
+        "prompt": prefix_stats(),
+        "responseParsing": parse_stats.stats(),
+        "planValidation": plan_validator.stats()
+    }
+
 # Include router in app
 app.include_router(api_router)
 
@@ -954,8 +1470,26 @@ async def startup_event():
     await db.chat_history.create_index([("userId", 1), ("timestamp", -1)])
     await db.portfolio_photos.create_index([("planId", 1), ("userId", 1)])
     await db.portfolio_photos.create_index([("userId", 1), ("uploadedAt", -1)])
+    await db.plan_jobs.create_index([("status", 1), ("runAt", 1)])
+    await db.plan_jobs.create_index([("userId", 1), ("createdAt", -1)])
+    await db.generation_cache.create_index("expiresAt", expireAfterSeconds=0)
+    await db.chat_history.create_index([("sessionId", 1), ("timestamp", -1)], sparse=True)
+    await db.chat_sessions.create_index([("userId", 1), ("updatedAt", -1)])
+    await db.generation_cache.create_index([("response.ageBand", 1), ("response.finalize", 1), ("createdAt", -1)])
+    await db.users.create_index("tokenVersionUpdatedAt", sparse=True)
     logger.info("Database indexes created")
+    if ADMIN_EMAILS:
+        result = await db.users.update_many({"email": {"$in": ADMIN_EMAILS}}, {"$set": {"role": "admin"}})
+        logger.info(f"Admin role granted to {result.matched_count} of {len(ADMIN_EMAILS)} ADMIN_EMAILS accounts")
+    logger.info(f"System prompt prefix: {STATIC_PREFIX.size_bytes} bytes, sha256 {STATIC_PREFIX.sha256[:12]}")
+    await llm_gateway.warm_up(ping=LLM_WARMUP_PING)
+    await plan_jobs.start()
+    await token_revocations.start()
+    password_hasher.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await plan_jobs.stop()
+    await token_revocations.stop()
+    password_hasher.stop()
     client.close()
\ No newline at end of file
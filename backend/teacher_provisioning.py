@@ -0,0 +1,104 @@
+"""Bulk teacher import for school administrators: parse, validate, insert unordered, report per row."""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from pymongo.errors import BulkWriteError
+
+TEACHER_FIELDS = ("email", "password", "name", "className", "ageDefault")
+AGE_BANDS = ("36_48", "48_60", "60_72")
+
+
+class ProvisioningInputError(ValueError):
+    pass
+
+
+def parse_teacher_rows(body: bytes, content_type: str) -> List[Dict[str, Any]]:
+    """Rows from a CSV upload (header line with TEACHER_FIELDS) or a JSON list / {"teachers": [...]}."""
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ProvisioningInputError("Upload must be UTF-8")
+    if "csv" in content_type:
+        return [dict(row) for row in csv.DictReader(io.StringIO(text))]
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        raise ProvisioningInputError("Upload must be CSV or JSON")
+    rows = data.get("teachers") if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ProvisioningInputError("JSON upload must be a list of teacher objects")
+    return rows
+
+
+def validate_rows(rows: List[Dict[str, Any]]) -> Tuple[List[Tuple[int, Dict[str, str]]], List[Dict[str, Any]]]:
+    """Split rows into `(row_number, teacher)` pairs to create and per-row rejection results."""
+    accepted: List[Tuple[int, Dict[str, str]]] = []
+    rejected: List[Dict[str, Any]] = []
+    seen = set()
+    for number, row in enumerate(rows, start=1):
+        teacher = {field: str(row.get(field) or "").strip() for field in TEACHER_FIELDS}
+        missing = [field for field in ("email", "password", "name") if not teacher[field]]
+        if missing:
+            rejected.append({"row": number, "email": teacher["email"], "status": "invalid",
+                             "error": f"Missing {', '.join(missing)}"})
+        elif "@" not in teacher["email"]:
+            rejected.append({"row": number, "email": teacher["email"], "status": "invalid", "error": "Invalid email"})
+        elif teacher["ageDefault"] and teacher["ageDefault"] not in AGE_BANDS:
+            rejected.append({"row": number, "email": teacher["email"], "status": "invalid",
+                             "error": f"ageDefault must be one of {', '.join(AGE_BANDS)}"})
+        elif teacher["email"] in seen:
+            rejected.append({"row": number, "email": teacher["email"], "status": "duplicate",
+                             "error": "Email repeated in upload"})
+        else:
+            seen.add(teacher["email"])
+            accepted.append((number, teacher))
+    return accepted, rejected
+
+
+def teacher_document(teacher: Dict[str, str], password_hash: str, school: str, now: datetime) -> Dict[str, Any]:
+    return {
+        "email": teacher["email"],
+        "passwordHash": password_hash,
+        "name": teacher["name"],
+        "school": school,
+        "className": teacher["className"] or None,
+        "ageDefault": teacher["ageDefault"] or "60_72",
+        "role": "teacher",
+        "createdAt": now
+    }
+
+
+async def insert_teachers(collection, numbered_docs: List[Tuple[int, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """One unordered insert_many; the unique email index reports existing accounts per row."""
+    if not numbered_docs:
+        return []
+    docs = [doc for _, doc in numbered_docs]
+    errors: Dict[int, Dict[str, Any]] = {}
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+
+    results = []
+    for index, (number, doc) in enumerate(numbered_docs):
+        error = errors.get(index)
+        if error is None:
+            results.append({"row": number, "email": doc["email"], "status": "created", "id": str(doc["_id"])})
+        elif error.get("code") == 11000:
+            results.append({"row": number, "email": doc["email"], "status": "exists",
+                            "error": "Email already registered"})
+        else:
+            results.append({"row": number, "email": doc["email"], "status": "error", "error": error.get("errmsg")})
+    return results
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    results.sort(key=lambda result: result["row"])
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return {"total": len(results), "counts": counts, "results": results}
@@ -0,0 +1,79 @@
+"""Route chat turns: underspecified requests get follow-up questions locally, the rest go to the model."""
+
+import re
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from generation_cache import normalize_text
+
+_WORD = re.compile(r"\w+")
+# Greetings and pleasantries; a message made only of these asks for nothing yet
+_CONTENT_FREE = {
+    "merhaba", "merhabalar", "selam", "selamlar", "günaydın", "iyi", "günler", "akşamlar", "kolay", "gelsin",
+    "nasılsın", "nasılsınız", "hocam", "hey", "alo", "slm", "mrb"
+}
+
+FOLLOW_UP_QUESTIONS = {
+    "theme": "Planın teması ya da konusu ne olsun? (ör. Sonbahar, Duygularımız, Trafik Kuralları)",
+    "focus": "Öne çıkarmak istediğiniz bir alan ya da beceri var mı? (ör. Türkçe, Matematik, Hareket ve Sağlık)"
+}
+
+
+def _content_free(text: str) -> bool:
+    # casefold() turns "İ" into "i" plus a combining dot
+    return all(word in _CONTENT_FREE for word in _WORD.findall(normalize_text(text).replace("\u0307", "")))
+
+
+class TurnRouter:
+    """Local classifier in front of the LLM.
+
+    Only clearly content-free conversations, where every teacher turn so far
+    is empty or a bare greeting, are answered by the rule engine with
+    follow-up questions. Anything else goes
+    to the large model, which picks a theme itself when none is given, as the
+    system prompt instructs. Decisions and latency are recorded per route.
+    """
+
+    def __init__(self, enabled: bool = True, window: int = 500):
+        self.enabled = enabled
+        self._window = window
+        self._latencies: Dict[str, Deque[float]] = {}
+        self.decisions: Dict[str, int] = {}
+
+    def missing_fields(self, message: str, history: List[Tuple[str, str]]) -> List[str]:
+        # Once the teacher has said anything of substance, short replies ("iyi", "hocam") answer the model
+        teacher_turns = [content for role, content in history if role == "user"] + [message]
+        if all(_content_free(turn) for turn in teacher_turns):
+            return ["theme"]
+        return []
+
+    def route(self, message: str, history: List[Tuple[str, str]]) -> Optional[List[str]]:
+        """Missing fields when the turn is answered locally, None when it goes to the model."""
+        if not self.enabled:
+            return None
+        return self.missing_fields(message, history) or None
+
+    def follow_up(self, missing: List[str], plan_type: str, age_band: str, plan_date: str) -> Dict[str, Any]:
+        return {
+            "finalize": False,
+            "type": plan_type,
+            "ageBand": age_band,
+            "date": plan_date,
+            "followUpQuestions": [FOLLOW_UP_QUESTIONS[field] for field in missing] + [FOLLOW_UP_QUESTIONS["focus"]],
+            "missingFields": missing
+        }
+
+    def record(self, route: str, seconds: float):
+        self.decisions[route] = self.decisions.get(route, 0) + 1
+        self._latencies.setdefault(route, deque(maxlen=self._window)).append(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        routes = {}
+        for route, latencies in self._latencies.items():
+            ordered = sorted(latencies)
+            routes[route] = {
+                "count": self.decisions[route],
+                "latencyMsAvg": round(1000 * sum(ordered) / len(ordered), 1),
+                "latencyMsP95": round(1000 * ordered[int(0.95 * (len(ordered) - 1))], 1)
+            }
+        return {"enabled": self.enabled, "routes": routes}
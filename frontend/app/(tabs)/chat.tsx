@@ -31,6 +31,7 @@ interface PlanPreview {
   theme?: string;
   activities?: Array<{title: string; location?: string; duration?: string}>;
   fullPlanData?: any;  // Store full plan data from AI
+  draftId?: string;  // Server-side copy of the plan, saved by reference
 }
 
 export default function ChatScreen() {
@@ -39,6 +40,7 @@ export default function ChatScreen() {
   const [isLoading, setIsLoading] = useState(false);
   const [planPreview, setPlanPreview] = useState<PlanPreview | null>(null);
   const [user, setUser] = useState<any>(null);
+  const [sessionId, setSessionId] = useState<string | null>(null);
   const scrollViewRef = useRef<ScrollView>(null);
 
   useEffect(() => {
@@ -66,6 +68,28 @@ export default function ChatScreen() {
     setMessages([welcomeMessage]);
   };
 
+  const ensureSession = async (token: string): Promise<string> => {
+    if (sessionId) return sessionId;
+
+    const response = await fetch(`${BACKEND_URL}/api/ai/sessions`, {
+      method: 'POST',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        ageBand: user?.ageDefault || '60_72',
+        planType: 'daily',
+      }),
+    });
+    if (!response.ok) {
+      throw new Error(`Session create failed: ${response.status}`);
+    }
+    const data = await response.json();
+    setSessionId(data.sessionId);
+    return data.sessionId;
+  };
+
   const sendMessage = async () => {
     if (!inputText.trim() || isLoading) return;
 
@@ -87,7 +111,9 @@ export default function ChatScreen() {
         return;
       }
 
-      const response = await fetch(`${BACKEND_URL}/api/ai/chat`, {
+      // The server keeps the conversation, so only the new message is sent
+      const activeSessionId = await ensureSession(token);
+      const response = await fetch(`${BACKEND_URL}/api/ai/sessions/${activeSessionId}/messages`, {
         method: 'POST',
         headers: {
           'Authorization': `Bearer ${token}`,
@@ -95,9 +121,6 @@ export default function ChatScreen() {
         },
         body: JSON.stringify({
           message: inputText.trim(),
-          history: messages.slice(-10), // Last 10 messages for context
-          ageBand: user?.ageDefault || '60_72',
-          planType: 'daily',
         }),
       });
 
@@ -130,10 +153,20 @@ export default function ChatScreen() {
               { title: 'Sanat Etkinliği', location: 'Sanat merkezi', duration: '30 dakika' },
               { title: 'Matematik Oyunu', location: 'Matematik merkezi', duration: '25 dakika' }
             ],
-            fullPlanData: planData
+            fullPlanData: planData,
+            draftId: response.headers.get('X-Draft-Id') || undefined
           });
         }
         
+      } else if (response.status === 404) {
+        // Session expired on the server; the next message starts a new one
+        setSessionId(null);
+        const errorMessage: Message = {
+          role: 'assistant',
+          content: 'Sohbet oturumu sona erdi. Lütfen mesajınızı tekrar gönderin.',
+          timestamp: new Date(),
+        };
+        setMessages(prev => [...prev, errorMessage]);
       } else if (response.status === 401) {
         Alert.alert('Hata', 'Oturum süresi dolmuş. Lütfen tekrar giriş yapın.');
         router.replace('/auth/login');
@@ -183,7 +216,10 @@ export default function ChatScreen() {
           date: planPreview.date,
           ageBand: planPreview.ageBand,
           title: planPreview.theme || 'AI Destekli Günlük Plan',
-          planJson: planPreview.fullPlanData || planPreview, // Use full plan data if available
+          // The server already holds generated plans; only re-upload when there is no draft id
+          ...(planPreview.draftId
+            ? { draftId: planPreview.draftId }
+            : { planJson: planPreview.fullPlanData || planPreview }),
         }),
       });
 
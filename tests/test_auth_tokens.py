@@ -0,0 +1,119 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from bson import ObjectId
+
+from auth_tokens import (
+    CLAIMS_VERSION, TokenRevocations, TokenVerifier, create_token, decode_token, principal_from_claims
+)
+
+SECRET = "test-secret-with-at-least-32-bytes!"
+USER = {"_id": ObjectId(), "email": "ayse@okul.k12.tr", "name": "Ayşe", "school": "Çiçek Anaokulu",
+        "className": None, "ageDefault": "60_72", "tokenVersion": 2}
+
+
+class FakeUsers:
+    def __init__(self, users=()):
+        self.users = {user["_id"]: dict(user) for user in users}
+        self.queries = []
+
+    async def find_one_and_update(self, query, update, **options):
+        user = self.users[query["_id"]]
+        user["tokenVersion"] = user.get("tokenVersion", 0) + update["$inc"]["tokenVersion"]
+        user.update(update["$set"])
+        return {"_id": user["_id"], "tokenVersion": user["tokenVersion"]}
+
+    async def _iterate(self, query):
+        for user in list(self.users.values()):
+            if user.get("tokenVersion", 0) > 0:
+                yield user
+
+    def find(self, query, projection):
+        self.queries.append(query)
+        return self._iterate(query)
+
+
+def test_plain_token_round_trip():
+    payload = decode_token(create_token(USER, SECRET), SECRET)
+    assert payload["user_id"] == str(USER["_id"]) and payload["tv"] == 2
+    assert "claims" not in payload
+    assert principal_from_claims(payload) is None
+
+
+def test_claims_token_rebuilds_the_user_without_empty_fields():
+    payload = decode_token(create_token(USER, SECRET, with_claims=True), SECRET)
+    assert principal_from_claims(payload) == {
+        "_id": USER["_id"], "email": USER["email"], "name": USER["name"], "school": USER["school"],
+        "ageDefault": "60_72"
+    }
+
+
+def test_older_claims_version_falls_back_to_the_database():
+    payload = decode_token(create_token(USER, SECRET, with_claims=True), SECRET)
+    payload["claims"]["v"] = CLAIMS_VERSION - 1
+    assert principal_from_claims(payload) is None
+
+
+def test_expired_or_forged_tokens_are_rejected():
+    with pytest.raises(jwt.ExpiredSignatureError):
+        decode_token(create_token(USER, SECRET, lifetime=timedelta(seconds=-1)), SECRET)
+    with pytest.raises(jwt.InvalidSignatureError):
+        decode_token(create_token(USER, "another-secret-of-at-least-32-bytes"), SECRET)
+
+
+def test_revoke_invalidates_earlier_tokens_only():
+    async def test():
+        revocations = TokenRevocations(FakeUsers([USER]))
+        old = decode_token(create_token(USER, SECRET), SECRET)
+        assert await revocations.revoke(str(USER["_id"])) == 3
+        assert revocations.is_revoked(old)
+        assert not revocations.is_revoked({**old, "tv": 3})
+        assert not revocations.is_revoked({"user_id": str(ObjectId())})
+        assert revocations.stats() == {"trackedUsers": 1, "rejected": 1}
+
+    asyncio.run(test())
+
+
+def test_refresh_picks_up_other_instances_and_only_polls_changes():
+    async def test():
+        users = FakeUsers([USER])
+        revocations = TokenRevocations(users)
+        await revocations.refresh()
+        assert revocations.is_revoked({"user_id": str(USER["_id"]), "tv": 1})
+        await revocations.refresh()
+        first, second = users.queries
+        assert "tokenVersionUpdatedAt" not in first
+        assert second["tokenVersionUpdatedAt"]["$gte"] < datetime.utcnow()
+
+    asyncio.run(test())
+
+
+def test_verifier_caches_by_digest_not_by_token():
+    verifier = TokenVerifier(SECRET)
+    token = create_token(USER, SECRET)
+    assert verifier.decode(token) is verifier.decode(token)
+    assert verifier.stats()["hits"] == 1
+    assert token not in verifier.cache._data
+
+
+def test_cached_payload_does_not_outlive_the_token():
+    verifier = TokenVerifier(SECRET, max_ttl=3600)
+    token = create_token(USER, SECRET, lifetime=timedelta(seconds=1.2))
+    verifier.decode(token)
+    (expires_at, _), = verifier.cache._data.values()
+    assert expires_at - time.monotonic() <= 1.2
+    time.sleep(1.3)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verifier.decode(token)
+
+
+def test_verifier_does_not_cache_rejected_tokens():
+    verifier = TokenVerifier(SECRET)
+    forged = create_token(USER, "another-secret-of-at-least-32-bytes")
+    for _ in range(2):
+        with pytest.raises(jwt.InvalidSignatureError):
+            verifier.decode(forged)
+    assert len(verifier.cache) == 0
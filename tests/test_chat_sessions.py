@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+from chat_sessions import ChatSessionStore
+
+USER = str(ObjectId())
+
+
+class FakeSessions:
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+        self.updates = 0
+
+    async def insert_one(self, doc):
+        doc = {"_id": ObjectId(), **doc}
+        self.docs[doc["_id"]] = doc
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def find_one(self, query):
+        self.reads += 1
+        return self.docs.get(query["_id"])
+
+    async def update_one(self, query, update):
+        self.updates += 1
+        self.docs[query["_id"]].update(update["$set"])
+
+
+class FakeCursor:
+    def __init__(self, records):
+        self.records = records
+
+    def sort(self, field, direction):
+        self.records = sorted(self.records, key=lambda record: record[field], reverse=direction < 0)
+        return self
+
+    async def to_list(self, length):
+        return self.records[:length]
+
+
+class FakeHistory:
+    def __init__(self, records=()):
+        self.records = list(records)
+
+    def find(self, query):
+        return FakeCursor([record for record in self.records if record["sessionId"] == query["sessionId"]])
+
+
+def test_follow_ups_are_served_from_the_cache():
+    async def test():
+        sessions = FakeSessions()
+        store = ChatSessionStore(sessions, FakeHistory())
+        session = await store.create(USER, "60_72", "daily")
+        await store.append(session, "Tema: sonbahar", {"finalize": False})
+        again = await store.get(session["id"], USER)
+        assert again["turns"] == [("user", "Tema: sonbahar"), ("assistant", '{"finalize": false}')]
+        assert sessions.reads == 0 and sessions.updates == 1
+
+    asyncio.run(test())
+
+
+def test_other_users_cannot_open_a_session():
+    async def test():
+        store = ChatSessionStore(FakeSessions(), FakeHistory())
+        session = await store.create(USER, "60_72", "daily")
+        assert await store.get(session["id"], str(ObjectId())) is None
+
+    asyncio.run(test())
+
+
+def test_turns_are_trimmed_to_max_turns():
+    async def test():
+        store = ChatSessionStore(FakeSessions(), FakeHistory(), max_turns=2)
+        session = await store.create(USER, "60_72", "daily")
+        for number in range(3):
+            await store.append(session, f"mesaj {number}", {"n": number})
+        assert [text for role, text in session["turns"] if role == "user"] == ["mesaj 1", "mesaj 2"]
+
+    asyncio.run(test())
+
+
+def test_evicted_sessions_are_rebuilt_from_history():
+    async def test():
+        sessions = FakeSessions()
+        started = datetime.utcnow()
+        store = ChatSessionStore(sessions, FakeHistory(), max_turns=2)
+        session = await store.create(USER, "48_60", "daily")
+        session_id = ObjectId(session["id"])
+        store.history.records = [
+            {"sessionId": session_id, "message": f"mesaj {number}", "response": {"n": number},
+             "timestamp": started + timedelta(seconds=number)}
+            for number in range(3)
+        ] + [{"sessionId": ObjectId(), "message": "başka", "response": {}, "timestamp": started}]
+        store.cache.clear()
+
+        loaded = await store.get(session["id"], USER)
+        assert loaded["ageBand"] == "48_60"
+        assert loaded["turns"] == [("user", "mesaj 1"), ("assistant", '{"n": 1}'),
+                                   ("user", "mesaj 2"), ("assistant", '{"n": 2}')]
+        assert await store.get(str(ObjectId()), USER) is None
+
+    asyncio.run(test())
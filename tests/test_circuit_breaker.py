@@ -0,0 +1,83 @@
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpen
+
+
+def call(breaker, fail=False):
+    try:
+        with breaker.guard():
+            if fail:
+                raise RuntimeError("provider failed")
+    except RuntimeError:
+        pass
+
+
+def tripped(**options):
+    breaker = CircuitBreaker(min_calls=4, failure_ratio=0.5, **options)
+    for fail in (True, False, True, False):
+        call(breaker, fail)
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_stays_closed_below_min_calls_and_ratio():
+    breaker = CircuitBreaker(min_calls=4, failure_ratio=0.5)
+    for fail in (True, True, True):
+        call(breaker, fail)
+    assert breaker.state == "closed"
+    breaker = CircuitBreaker(min_calls=4, failure_ratio=0.5)
+    for fail in (True, False, False, False):
+        call(breaker, fail)
+    assert breaker.state == "closed"
+
+
+def test_open_circuit_rejects_without_running_the_call():
+    breaker = tripped(open_seconds=60)
+    with pytest.raises(CircuitOpen) as rejected:
+        with breaker.guard():
+            pytest.fail("call ran while the circuit was open")
+    assert rejected.value.retry_after > 0
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+
+def test_slow_calls_trip_the_breaker():
+    breaker = CircuitBreaker(min_calls=2, slow_call_seconds=0.0, slow_ratio=1.0)
+    call(breaker)
+    call(breaker)
+    assert breaker.state == "open"
+
+
+def test_successful_trials_close_the_circuit():
+    breaker = tripped(open_seconds=0, half_open_trials=2)
+    call(breaker)
+    assert breaker.state == "half_open"
+    call(breaker)
+    assert breaker.state == "closed"
+
+
+def test_trial_failure_reopens_the_circuit():
+    breaker = tripped(open_seconds=0, half_open_trials=2)
+    call(breaker)
+    call(breaker, fail=True)
+    assert breaker.state == "open"
+    assert breaker.opened == 2
+
+
+def test_half_open_admits_only_the_trial_calls():
+    breaker = tripped(open_seconds=0, half_open_trials=1)
+    with breaker.guard():
+        with pytest.raises(CircuitOpen):
+            with breaker.guard():
+                pass
+    assert breaker.state == "closed"
+
+
+def test_cancelled_trial_frees_its_slot():
+    breaker = tripped(open_seconds=0, half_open_trials=1)
+    with pytest.raises(KeyboardInterrupt):
+        with breaker.guard():
+            raise KeyboardInterrupt
+    assert breaker.state == "half_open"
+    call(breaker)
+    assert breaker.state == "closed"
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from generation_cache import GenerationCache, generation_key
+
+
+class FakeCache:
+    def __init__(self, fail=False):
+        self.docs = {}
+        self.fail = fail
+        self.finds = 0
+
+    async def find_one(self, query):
+        self.finds += 1
+        if self.fail:
+            raise ConnectionError("mongo down")
+        doc = self.docs.get(query["_id"])
+        if doc is None or doc["expiresAt"] <= query["expiresAt"]["$gt"]:
+            return None
+        return doc
+
+    async def replace_one(self, query, doc, upsert=False):
+        if self.fail:
+            raise ConnectionError("mongo down")
+        self.docs[query["_id"]] = {"_id": query["_id"], **doc}
+
+
+def key(message, **fields):
+    options = {"history": [], "age_band": "60_72", "plan_type": "daily", "date": "2026-10-19",
+               "user_age_band": "60_72", **fields}
+    return generation_key(message, **options)
+
+
+def test_key_ignores_case_and_whitespace_only():
+    assert key("Sonbahar  teması") == key("  sonbahar teması\n")
+    assert key("Sonbahar teması") != key("Sonbahar teması", age_band="48_60")
+    assert key("Sonbahar teması") != key("Sonbahar teması", history=[{"role": "user", "content": "merhaba"}])
+
+
+def test_memory_then_mongo_then_miss():
+    async def test():
+        collection = FakeCache()
+        cache = GenerationCache(collection)
+        await cache.set("k", {"finalize": True})
+        assert await cache.get("k") == {"finalize": True}
+        assert collection.finds == 0
+
+        fresh = GenerationCache(collection)
+        assert await fresh.get("k") == {"finalize": True}
+        assert await fresh.get("k") == {"finalize": True}
+        assert collection.finds == 1
+        assert await fresh.get("other") is None
+        stats = fresh.stats()
+        assert (stats["memoryHits"], stats["mongoHits"], stats["misses"]) == (1, 1, 1)
+
+    asyncio.run(test())
+
+
+def test_expired_documents_are_misses():
+    async def test():
+        collection = FakeCache()
+        collection.docs["k"] = {"_id": "k", "response": {"finalize": True},
+                                "expiresAt": datetime.utcnow() - timedelta(seconds=1)}
+        assert await GenerationCache(collection).get("k") is None
+
+    asyncio.run(test())
+
+
+def test_callers_get_copies():
+    async def test():
+        cache = GenerationCache(FakeCache())
+        plan = {"blocks": {"activities": []}}
+        await cache.set("k", plan)
+        plan["blocks"]["activities"].append("changed")
+        cached = await cache.get("k")
+        cached["blocks"]["activities"].append("changed again")
+        assert (await cache.get("k")) == {"blocks": {"activities": []}}
+
+    asyncio.run(test())
+
+
+def test_mongo_errors_degrade_to_misses():
+    async def test():
+        cache = GenerationCache(FakeCache(fail=True))
+        await cache.set("k", {"finalize": True})
+        cache.memory.clear()
+        assert await cache.get("k") is None
+
+    asyncio.run(test())
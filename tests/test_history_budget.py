@@ -0,0 +1,39 @@
+import json
+
+from history_budget import compact_history, estimate_tokens, summarize_turn
+from prompt_builder import EXAMPLE_PLAN_JSON
+
+
+def test_short_history_is_kept_verbatim():
+    history = [("user", "Sonbahar temalı plan"), ("assistant", "Hangi yaş grubu?")]
+    assert compact_history(history, "5 yaş", budget_tokens=1000, verbatim_turns=4) == (
+        "user: Sonbahar temalı plan\nassistant: Hangi yaş grubu?\nuser: 5 yaş"
+    )
+
+
+def test_older_plans_shrink_to_an_outline():
+    plan = json.loads(EXAMPLE_PLAN_JSON)
+    history = [("user", "Plan hazırla"), ("assistant", EXAMPLE_PLAN_JSON), ("user", "Teşekkürler")]
+    text = compact_history(history, "Bir tane daha", budget_tokens=10000, verbatim_turns=1)
+    lines = text.split("\n")
+    assert lines[1].startswith("assistant: [önceki plan]")
+    assert f"tema: {plan['theme']}" in lines[1]
+    assert lines[2:] == ["user: Teşekkürler", "user: Bir tane daha"]
+
+
+def test_oldest_turns_are_dropped_to_fit_the_budget():
+    history = [("user", "x" * 300) for _ in range(10)]
+    text = compact_history(history, "yeni mesaj", budget_tokens=300, verbatim_turns=2)
+    assert estimate_tokens(text) <= 300 + len(text.split("\n"))
+    assert text.split("\n")[0].endswith("eski mesaj çıkarıldı]")
+    assert text.endswith("user: yeni mesaj")
+
+
+def test_new_message_is_always_included():
+    text = compact_history([("user", "önceki")], "yeni", budget_tokens=0, verbatim_turns=2)
+    assert text == "[1 eski mesaj çıkarıldı]\nuser: yeni"
+
+
+def test_long_text_turns_are_truncated_in_summaries():
+    summary = summarize_turn("user", "kelime " * 100)
+    assert summary.endswith("…") and len(summary) < 220
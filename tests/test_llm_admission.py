@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from llm_admission import AdmissionRejected, LlmAdmission
+
+
+async def _grant_order(admission, waiters):
+    """Queue `waiters` behind a held slot, then release it and record who gets a slot in turn."""
+    await admission.acquire("holder", "holder")
+    order = []
+
+    async def wait(school, user):
+        await admission.acquire(school, user)
+        order.append((school, user))
+
+    tasks = []
+    for school, user in waiters:
+        tasks.append(asyncio.ensure_future(wait(school, user)))
+        await asyncio.sleep(0)
+    admission.release()
+    for _ in waiters:
+        await asyncio.sleep(0)
+        admission.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_slots_rotate_across_schools_and_users():
+    waiters = [("a", "a1"), ("a", "a1"), ("a", "a2"), ("b", "b1")]
+    order = asyncio.run(_grant_order(LlmAdmission(max_concurrency=1), waiters))
+    assert order == [("a", "a1"), ("b", "b1"), ("a", "a2"), ("a", "a1")]
+
+
+def test_school_weight_grants_consecutive_turns():
+    waiters = [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1")]
+    order = asyncio.run(_grant_order(LlmAdmission(max_concurrency=1, school_weights={"a": 2}), waiters))
+    assert order == [("a", "a1"), ("a", "a2"), ("b", "b1"), ("a", "a3")]
+
+
+def test_waiting_past_max_wait_is_rejected():
+    async def run():
+        admission = LlmAdmission(max_concurrency=1, max_wait=0.01)
+        await admission.acquire("a", "a1")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire("b", "b1")
+        assert rejected.value.retry_after >= 1
+        assert admission.stats()["queueDepth"] == 0
+
+    asyncio.run(run())
+
+
+def test_full_queue_is_rejected_immediately():
+    async def run():
+        admission = LlmAdmission(max_concurrency=1, max_queue=1)
+        await admission.acquire("a", "a1")
+        queued = asyncio.ensure_future(admission.acquire("a", "a2"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected, match="queue is full"):
+            await admission.acquire("b", "b1")
+        queued.cancel()
+
+    asyncio.run(run())
+
+
+def test_cancellation_while_queued_frees_the_queue_entry():
+    async def run():
+        admission = LlmAdmission(max_concurrency=1)
+        await admission.acquire("a", "a1")
+        queued = asyncio.ensure_future(admission.acquire("b", "b1"))
+        await asyncio.sleep(0)
+        assert admission.stats()["queueDepth"] == 1
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert admission.stats()["queueDepth"] == 0
+        admission.release()
+        assert admission.stats()["inFlight"] == 0
+
+    asyncio.run(run())
+
+
+def test_slot_context_releases_on_error():
+    async def run():
+        admission = LlmAdmission(max_concurrency=1)
+        with pytest.raises(RuntimeError):
+            async with admission.slot("a", "a1"):
+                raise RuntimeError("provider failed")
+        assert admission.stats()["inFlight"] == 0
+
+    asyncio.run(run())
+
+
+def test_try_acquire_never_jumps_the_queue():
+    async def run():
+        admission = LlmAdmission(max_concurrency=2)
+        assert admission.try_acquire()
+        assert admission.try_acquire()
+        assert not admission.try_acquire()
+        admission.release()
+        assert admission.try_acquire()
+
+    asyncio.run(run())
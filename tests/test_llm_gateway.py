@@ -0,0 +1,171 @@
+import asyncio
+
+import pytest
+
+from circuit_breaker import CircuitBreaker, CircuitOpen
+from llm_admission import LlmAdmission
+from llm_gateway import LlmDeadlineExceeded, LlmGateway, RetryBudget
+from llm_providers import LlmProvider
+
+
+class ScriptedProvider(LlmProvider):
+    """Each call takes the next `(delay, reply_or_exception)` from the script."""
+
+    name = "scripted"
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.started = 0
+        self.cancelled = 0
+        self.outstanding = 0
+        self.peak = 0
+
+    async def complete(self, text):
+        delay, outcome = self.script[min(self.started, len(self.script) - 1)]
+        self.started += 1
+        self.outstanding += 1
+        self.peak = max(self.peak, self.outstanding)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.outstanding -= 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def gateway(provider, **options):
+    # Until enough latencies are recorded, hedges fire at half the deadline
+    options.setdefault("hedge_min_delay", 0.02)
+    return LlmGateway(provider, **options)
+
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled():
+    async def run():
+        provider = ScriptedProvider([(2.0, "slow"), (0.01, "fast")])
+        llm = gateway(provider, timeout=0.5)
+        assert await llm.complete("prompt") == "fast"
+        await asyncio.sleep(0)
+        assert (llm.hedges, llm.hedge_wins, provider.cancelled) == (1, 1, 1)
+
+    asyncio.run(run())
+
+
+def test_fast_reply_is_not_hedged():
+    async def run():
+        provider = ScriptedProvider([(0.0, "ok")])
+        llm = gateway(provider, timeout=2)
+        assert await llm.complete("prompt") == "ok"
+        assert llm.hedges == 0 and provider.started == 1
+
+    asyncio.run(run())
+
+
+def test_hedge_is_skipped_when_admission_is_full():
+    async def run():
+        provider = ScriptedProvider([(0.4, "ok")])
+        admission = LlmAdmission(max_concurrency=2)
+        llm = gateway(provider, admission=admission, timeout=0.5)
+        replies = await asyncio.gather(*[llm.complete("prompt", ("school", str(user))) for user in range(2)])
+        await asyncio.sleep(0)
+        assert replies == ["ok", "ok"]
+        assert provider.peak == 2
+        assert (llm.hedges, llm.hedges_skipped) == (0, 2)
+        assert admission.stats()["inFlight"] == 0
+
+    asyncio.run(run())
+
+
+def test_hedge_slot_is_released_after_the_loser_is_cancelled():
+    async def run():
+        provider = ScriptedProvider([(2.0, "slow"), (0.01, "fast")])
+        admission = LlmAdmission(max_concurrency=4)
+        llm = gateway(provider, admission=admission, timeout=0.5)
+        assert await llm.complete("prompt", ("school", "user")) == "fast"
+        await asyncio.sleep(0)
+        assert llm.hedges == 1
+        assert admission.stats()["inFlight"] == 0
+
+    asyncio.run(run())
+
+
+def test_deadline_exceeded_cancels_outstanding_attempts():
+    async def run():
+        provider = ScriptedProvider([(1.0, "late")])
+        llm = gateway(provider, timeout=0.05)
+        with pytest.raises(LlmDeadlineExceeded):
+            await llm.complete("prompt")
+        await asyncio.sleep(0)
+        assert provider.outstanding == 0
+        assert llm.deadline_exceeded == 1
+
+    asyncio.run(run())
+
+
+def test_failed_call_is_retried_within_budget():
+    async def run():
+        provider = ScriptedProvider([(0.0, RuntimeError("boom")), (0.0, "ok")])
+        llm = gateway(provider, timeout=2, max_attempts=2)
+        assert await llm.complete("prompt") == "ok"
+        assert llm.retries == 1
+
+    asyncio.run(run())
+
+
+def test_empty_retry_budget_stops_retries_and_hedges():
+    async def run():
+        budget = RetryBudget(ratio=0.0, max_tokens=0.0)
+        provider = ScriptedProvider([(0.3, RuntimeError("boom")), (0.0, "ok")])
+        llm = gateway(provider, timeout=0.5, retry_budget=budget, max_attempts=3)
+        with pytest.raises(RuntimeError):
+            await llm.complete("prompt")
+        assert provider.started == 1
+        assert (llm.retries, llm.hedges) == (0, 0)
+        assert budget.denied == 2
+
+    asyncio.run(run())
+
+
+def test_retry_budget_refills_from_regular_calls():
+    budget = RetryBudget(ratio=0.5, max_tokens=1.0)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.deposit()
+    budget.deposit()
+    assert budget.try_spend()
+
+
+def test_open_circuit_fails_fast_without_calling_the_provider():
+    async def run():
+        provider = ScriptedProvider([(0.0, RuntimeError("down"))])
+        breaker = CircuitBreaker(min_calls=2, failure_ratio=0.5, open_seconds=60)
+        llm = gateway(provider, timeout=2, max_attempts=1, breaker=breaker)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await llm.complete("prompt")
+        with pytest.raises(CircuitOpen):
+            await llm.complete("prompt")
+        assert provider.started == 2
+
+    asyncio.run(run())
+
+
+def test_stream_respects_the_deadline():
+    class SlowStream(ScriptedProvider):
+        async def stream(self, text):
+            yield "first"
+            await asyncio.sleep(1)
+            yield "never"
+
+    async def run():
+        llm = gateway(SlowStream([(0.0, "")]), timeout=0.05)
+        chunks = []
+        with pytest.raises(LlmDeadlineExceeded):
+            async for chunk in llm.stream("prompt"):
+                chunks.append(chunk)
+        assert chunks == ["first"]
+
+    asyncio.run(run())
@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+
+import pytest
+
+import passwords
+from passwords import HasherBusy, PasswordHasher
+
+ROUNDS = 2000
+
+
+def run_with_hasher(test, **options):
+    async def run():
+        hasher = PasswordHasher(workers=1, rounds=ROUNDS, **options)
+        try:
+            return await test(hasher)
+        finally:
+            hasher.stop()
+
+    return asyncio.run(run())
+
+
+def count_kdf_runs(hasher):
+    """Wrap the pool entry point and count jobs sent to the workers."""
+    runs = []
+    original = hasher._run
+
+    async def counted(fn, *args, **kwargs):
+        runs.append(fn.__name__)
+        return await original(fn, *args, **kwargs)
+
+    hasher._run = counted
+    return runs
+
+
+def test_hash_then_verify():
+    async def test(hasher):
+        hashed = await hasher.hash("gizli-parola")
+        assert hashed.startswith(f"$pbkdf2-sha256${ROUNDS}$")
+        assert await hasher.verify("gizli-parola", hashed) == (True, None)
+        assert await hasher.verify("yanlış", hashed) == (False, None)
+
+    run_with_hasher(test)
+
+
+def test_legacy_hash_is_replaced_on_success():
+    async def test(hasher):
+        legacy = hashlib.sha256(b"eski-parola").hexdigest()
+        valid, new_hash = await hasher.verify("eski-parola", legacy)
+        assert valid and new_hash.startswith("$pbkdf2-sha256$")
+        assert await hasher.verify("eski-parola", new_hash) == (True, None)
+        assert hasher.stats()["rehashed"] == 1
+
+    run_with_hasher(test)
+
+
+def test_low_round_hash_is_upgraded():
+    async def test(hasher):
+        weak = passwords._hash("parola", 1000)
+        valid, new_hash = await hasher.verify("parola", weak)
+        assert valid and new_hash.startswith(f"$pbkdf2-sha256${ROUNDS}$")
+
+    run_with_hasher(test)
+
+
+def test_every_failed_login_costs_one_kdf_run():
+    async def test(hasher):
+        runs = count_kdf_runs(hasher)
+        legacy = hashlib.sha256(b"eski-parola").hexdigest()
+        assert await hasher.verify("yanlış", legacy) == (False, None)
+        assert await hasher.verify("yanlış", await hasher.hash("parola")) == (False, None)
+        assert await hasher.verify_missing("yanlış") is False
+        assert runs == ["_verify", "_hash", "_verify", "_verify"]
+
+    run_with_hasher(test)
+
+
+def test_dummy_hash_uses_full_rounds():
+    hasher = PasswordHasher(rounds=ROUNDS)
+    assert hasher._dummy_hash.startswith(f"$pbkdf2-sha256${ROUNDS}$")
+    assert not hasher._context.needs_update(hasher._dummy_hash)
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def test(hasher):
+        hasher._pending = hasher.workers + hasher.max_queue
+        with pytest.raises(HasherBusy) as busy:
+            await hasher.hash("parola")
+        assert busy.value.retry_after >= 1
+        assert hasher.stats()["rejected"] == 1
+
+    run_with_hasher(test, max_queue=0)
+
+
+def test_hash_many_counts_batches_in_the_queue():
+    async def test(hasher):
+        depths = []
+        original = hasher._run
+
+        async def observed(fn, *args, **kwargs):
+            task = asyncio.ensure_future(original(fn, *args, **kwargs))
+            await asyncio.sleep(0)
+            depths.append(hasher._pending)
+            return await task
+
+        hasher._run = observed
+        hashes = await hasher.hash_many(["a", "b", "c"], rounds=1000, batch_size=2)
+        assert len(hashes) == 3 and all(h.startswith("$pbkdf2-sha256$1000$") for h in hashes)
+        assert depths[:2] == [2, 1]
+        assert hasher.hashed == 3
+
+    run_with_hasher(test)
+
+
+def test_hash_many_shares_one_set_of_bulk_slots():
+    async def test(hasher):
+        active = peak = 0
+        original = hasher._run
+
+        async def tracked(fn, *args, **kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            try:
+                return await original(fn, *args, **kwargs)
+            finally:
+                active -= 1
+
+        hasher._run = tracked
+        await asyncio.gather(hasher.hash_many(["a", "b"], batch_size=1), hasher.hash_many(["c", "d"], batch_size=1))
+        assert peak == 1
+
+    run_with_hasher(test)
+
+
+def test_hash_many_is_rejected_when_the_queue_is_full():
+    async def test(hasher):
+        hasher._pending = hasher.workers + hasher.max_queue
+        with pytest.raises(HasherBusy):
+            await hasher.hash_many(["a", "b"])
+
+    run_with_hasher(test, max_queue=0)
@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+from plan_jobs import PlanJobQueue
+
+
+class FakeJobs:
+    """Just enough of a collection for the lease logic: equality filters and `$set`."""
+
+    def __init__(self, *docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.claims = []
+        self.cleanups = []
+
+    async def find_one_and_update(self, query, update, **options):
+        self.claims.append((query, update))
+        return None
+
+    async def update_many(self, query, update):
+        self.cleanups.append((query, update))
+
+    async def update_one(self, query, update):
+        doc = self.docs.get(query["_id"])
+        if doc is None or any(doc.get(key) != value for key, value in query.items()):
+            return SimpleNamespace(matched_count=0)
+        doc.update(update["$set"])
+        return SimpleNamespace(matched_count=1)
+
+
+def running_job(attempts=1):
+    return {"_id": ObjectId(), "status": "running", "attempts": attempts, "leaseId": ObjectId(),
+            "leaseUntil": datetime.utcnow()}
+
+
+def run_job(queue, job):
+    async def run():
+        slots = asyncio.Semaphore(1)
+        await slots.acquire()
+        await queue._run(dict(job), slots)
+        return slots.locked()
+
+    return asyncio.run(run())
+
+
+def test_expired_leases_are_only_reclaimed_below_max_attempts():
+    jobs = FakeJobs()
+    queue = PlanJobQueue(jobs, handler=None, max_attempts=3)
+    asyncio.run(queue._claim())
+    asyncio.run(queue._fail_abandoned())
+
+    (query, update), = jobs.claims
+    queued, expired = query["$or"]
+    assert queued["status"] == "queued"
+    assert expired["status"] == "running" and expired["attempts"] == {"$lt": 3}
+    assert update["$inc"] == {"attempts": 1}
+    assert isinstance(update["$set"]["leaseId"], ObjectId)
+
+    (query, update), = jobs.cleanups
+    assert query["attempts"] == {"$gte": 3}
+    assert update["$set"]["status"] == "failed"
+
+
+def test_result_is_written_by_the_lease_holder():
+    job = running_job()
+    jobs = FakeJobs(dict(job))
+
+    async def handler(job):
+        return {"finalize": True}
+
+    assert run_job(PlanJobQueue(jobs, handler), job) is False
+    stored = jobs.docs[job["_id"]]
+    assert stored["status"] == "done" and stored["result"] == {"finalize": True}
+    assert stored["leaseId"] is None
+
+
+def test_outcome_is_dropped_after_the_lease_moves():
+    job = running_job()
+    jobs = FakeJobs({**job, "leaseId": ObjectId()})
+    queue = PlanJobQueue(jobs, handler=None)
+    assert asyncio.run(queue._finish(job, {"status": "done"})) is False
+    assert jobs.docs[job["_id"]]["status"] == "running"
+
+
+def test_failures_are_retried_then_failed():
+    async def handler(job):
+        raise RuntimeError("model error")
+
+    for attempts, status in [(1, "queued"), (3, "failed")]:
+        job = running_job(attempts)
+        jobs = FakeJobs(dict(job))
+        run_job(PlanJobQueue(jobs, handler, max_attempts=3), job)
+        stored = jobs.docs[job["_id"]]
+        assert stored["status"] == status and stored["error"] == "model error"
+
+
+def test_losing_the_lease_cancels_the_handler():
+    job = running_job()
+    jobs = FakeJobs(dict(job))
+    cancelled = []
+
+    async def handler(job):
+        # Another worker reclaims the job while this attempt is still running
+        jobs.docs[job["_id"]]["leaseId"] = ObjectId()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    assert run_job(PlanJobQueue(jobs, handler, lease_seconds=0.03), job) is False
+    assert cancelled == [True]
+    assert jobs.docs[job["_id"]]["status"] == "running"
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+from plan_schema import JSON_SCHEMA, PlanValidator, compile_schema
+from prompt_builder import EXAMPLE_PLAN_JSON
+
+
+def errors_for(schema, value):
+    errors = []
+    compile_schema(schema)(value, (), errors)
+    return errors
+
+
+def test_example_plan_is_valid():
+    assert PlanValidator(JSON_SCHEMA).errors(json.loads(EXAMPLE_PLAN_JSON)) == []
+
+
+def test_violations_are_reported_by_path():
+    plan = json.loads(EXAMPLE_PLAN_JSON)
+    plan["ageBand"] = "72_84"
+    plan["blocks"]["activities"][1]["steps"] = "tek adım"
+    del plan["blocks"]["assessment"]
+    errors = dict(PlanValidator(JSON_SCHEMA).errors(plan))
+    assert set(errors) == {"ageBand", "blocks.activities[1].steps", "blocks.assessment"}
+    assert errors["blocks.assessment"] == "eksik"
+
+
+def test_booleans_are_not_numbers_and_additional_properties_can_be_closed():
+    schema = {"type": "object", "properties": {"count": {"type": "integer"}}, "additionalProperties": False}
+    assert errors_for(schema, {"count": True, "extra": 1}) == [
+        (("count",), "integer olmalı"),
+        (("extra",), "tanımsız alan")
+    ]
+
+
+def test_follow_up_turns_are_not_validated():
+    async def run():
+        async def complete(text):
+            raise AssertionError("no repair call expected")
+
+        plan = {"finalize": False, "followUpQuestions": ["Tema?"]}
+        return await PlanValidator(JSON_SCHEMA).validate_and_repair(plan, complete, json.loads, "ctx")
+
+    assert asyncio.run(run()) == {"finalize": False, "followUpQuestions": ["Tema?"]}
+
+
+def test_repair_patches_only_the_requested_paths():
+    async def run():
+        prompts = []
+
+        async def complete(text):
+            prompts.append(text)
+            return json.dumps({"blocks.assessment": ["Gözlem formu"], "theme": "Başka tema"})
+
+        plan = json.loads(EXAMPLE_PLAN_JSON)
+        theme = plan["theme"]
+        del plan["blocks"]["assessment"]
+        validator = PlanValidator(JSON_SCHEMA)
+        repaired = await validator.validate_and_repair(plan, complete, json.loads, "ctx")
+        assert repaired["blocks"]["assessment"] == ["Gözlem formu"]
+        assert repaired["theme"] == theme
+        assert len(prompts) == 1 and "blocks.assessment: eksik" in prompts[0]
+        assert validator.stats()["repaired"] == 1
+
+    asyncio.run(run())
+
+
+def test_failed_repair_returns_the_plan_unchanged():
+    async def run():
+        async def complete(text):
+            raise RuntimeError("provider down")
+
+        plan = json.loads(EXAMPLE_PLAN_JSON)
+        plan["date"] = 20251017
+        return await PlanValidator(JSON_SCHEMA).validate_and_repair(plan, complete, json.loads, "ctx", max_rounds=2)
+
+    assert asyncio.run(run())["date"] == 20251017
@@ -0,0 +1,47 @@
+import json
+
+from plan_stream import PlanSectionParser, iter_sections, sse_event
+from prompt_builder import EXAMPLE_PLAN_JSON
+
+
+def feed_in_chunks(text, size):
+    parser = PlanSectionParser()
+    sections = []
+    for start in range(0, len(text), size):
+        sections.extend(parser.feed(text[start:start + size]))
+    return sections
+
+
+def test_sections_match_the_complete_plan_for_any_chunking():
+    plan = json.loads(EXAMPLE_PLAN_JSON)
+    expected = iter_sections(plan)
+    text = "İşte plan:\n```json\n" + EXAMPLE_PLAN_JSON + "\n```"
+    for size in (1, 7, 64, len(text)):
+        assert feed_in_chunks(text, size) == expected
+
+
+def test_activity_is_reported_as_soon_as_it_closes():
+    parser = PlanSectionParser()
+    assert parser.feed('{"theme": "Su", "blocks": {"activities": [{"title": "Damla"}') == [
+        ("theme", "Su"),
+        ("blocks.activities[0]", {"title": "Damla"})
+    ]
+    assert parser.feed(', {"title": "Bulut') == []
+    assert parser.feed('"}]}}') == [("blocks.activities[1]", {"title": "Bulut"})]
+
+
+def test_nested_and_escaped_content_does_not_leak_sections():
+    text = '{"notes": {"theme": "not a section"}, "theme": "Ses \\"yankı\\" {x}"}'
+    assert feed_in_chunks(text, 3) == [("theme", 'Ses "yankı" {x}')]
+
+
+def test_text_after_the_root_object_is_ignored():
+    parser = PlanSectionParser()
+    parser.feed('{"theme": "Ay"} and then {"theme": "Güneş"}')
+    assert parser.feed(' more') == []
+
+
+def test_sse_event_frame():
+    assert sse_event("section", {"path": "theme", "value": "Ağaç"}) == (
+        'event: section\ndata: {"path": "theme", "value": "Ağaç"}\n\n'
+    )
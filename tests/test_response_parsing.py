@@ -0,0 +1,97 @@
+import json
+import time
+
+import pytest
+
+from prompt_builder import EXAMPLE_PLAN_JSON
+from response_parsing import ResponseParseError, extract_json, is_plan_response, parse_response
+
+
+def test_plain_json_parses_directly():
+    assert extract_json('{"finalize": true}') == ({"finalize": True}, "direct")
+
+
+def test_code_fence_and_trailing_prose_are_skipped():
+    text = 'İşte plan:\n```json\n{"finalize": true, "theme": "Sonbahar"}\n```\nİyi çalışmalar!'
+    assert extract_json(text) == ({"finalize": True, "theme": "Sonbahar"}, "extracted")
+
+
+def test_braces_inside_strings_do_not_end_the_object():
+    text = 'x {"notes": "a } b { c", "finalize": false} y'
+    assert extract_json(text) == ({"notes": "a } b { c", "finalize": False}, "extracted")
+
+
+def test_unclosed_brace_in_prose_moves_on_to_the_next_object():
+    value, _ = extract_json('prose with { a stray brace and then {"finalize": true}')
+    assert value == {"finalize": True}
+
+
+def test_closed_non_json_braces_in_prose_are_skipped():
+    value, _ = extract_json('use {placeholders} like this: {"finalize": false}')
+    assert value == {"finalize": False}
+
+
+def test_malformed_plan_never_yields_a_nested_object():
+    # One missing comma between two top-level fields
+    text = EXAMPLE_PLAN_JSON.replace('  },\n  "blocks"', '  }\n  "blocks"')
+    assert text != EXAMPLE_PLAN_JSON
+    with pytest.raises(ResponseParseError):
+        extract_json("İşte plan:\n" + text)
+
+
+def test_scan_resumes_after_a_malformed_object():
+    value, how = extract_json('{"finalize": true "x": 1} sonra {"finalize": false}')
+    assert (value, how) == ({"finalize": False}, "extracted")
+
+
+def test_unclosed_prose_brace_before_truncated_json_is_repaired_from_the_json():
+    value, how = extract_json('prose { stray {"finalize": true, "theme": "Su", "blocks": {"a')
+    assert (value, how) == ({"finalize": True, "theme": "Su", "blocks": {}}, "repaired")
+
+
+@pytest.mark.parametrize("text", ["prose " + "{ " * 5000, "x" + '{"a": ' * 5000], ids=["prose", "nested"])
+def test_pathological_brace_runs_stay_linear(text):
+    started = time.perf_counter()
+    with pytest.raises(ResponseParseError):
+        extract_json(text)
+    assert time.perf_counter() - started < 0.5
+
+
+def test_truncated_json_after_many_prose_braces_is_found_quickly():
+    started = time.perf_counter()
+    assert extract_json("{ " * 5000 + '{"finalize": true') == ({"finalize": True}, "repaired")
+    assert time.perf_counter() - started < 0.5
+
+
+def test_plan_shape_check():
+    assert is_plan_response({"finalize": False, "followUpQuestions": []})
+    assert is_plan_response({"type": "daily"})
+    assert not is_plan_response({"code": "TAEOB1", "indicators": []})
+
+
+def test_truncated_plan_is_cut_back_to_the_last_complete_value():
+    plan = json.loads(EXAMPLE_PLAN_JSON)
+    text = EXAMPLE_PLAN_JSON
+    cut = text.index('"title"', text.index('"activities"')) + 12
+    value, how = extract_json(text[:cut])
+    assert how == "repaired"
+    assert value["theme"] == plan["theme"]
+    assert value["domainOutcomes"] == plan["domainOutcomes"]
+
+
+@pytest.mark.parametrize("text", ['{"finalize": tr', '{"a": "unterminated', '{', '```json\n{"fin'])
+def test_truncation_inside_the_first_value_is_rejected(text):
+    with pytest.raises(ResponseParseError):
+        extract_json(text)
+
+
+def test_parse_response_reports_how_it_parsed():
+    outcomes = []
+    parse_response('{"finalize": true, "theme": "Su", "blocks": {"activities": [{"title": "Su', outcomes)
+    parse_response('{"finalize": true}', outcomes)
+    assert outcomes == ["repaired", "direct"]
+
+
+def test_non_object_json_is_rejected():
+    with pytest.raises(ResponseParseError):
+        parse_response("[1, 2, 3]")
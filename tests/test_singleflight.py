@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def test():
+        flights = SingleFlight()
+        calls = []
+        release = asyncio.Event()
+
+        async def generate():
+            calls.append(1)
+            await release.wait()
+            return {"finalize": True}
+
+        waiters = [asyncio.ensure_future(flights.do("user:plan", generate)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+        assert calls == [1]
+        assert results == [{"finalize": True}] * 3
+        assert flights.stats() == {"inFlight": 0, "leaders": 1, "coalesced": 2}
+
+    asyncio.run(test())
+
+
+def test_finished_keys_run_again():
+    async def test():
+        flights = SingleFlight()
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            return len(calls)
+
+        assert await flights.do("key", generate) == 1
+        assert await flights.do("key", generate) == 2
+
+    asyncio.run(test())
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def test():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def generate():
+            await release.wait()
+            return "plan"
+
+        leaver = asyncio.ensure_future(flights.do("key", generate))
+        stayer = asyncio.ensure_future(flights.do("key", generate))
+        await asyncio.sleep(0)
+        leaver.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await stayer == "plan"
+        assert leaver.cancelled()
+
+    asyncio.run(test())
+
+
+def test_errors_reach_every_waiter():
+    async def test():
+        flights = SingleFlight()
+
+        async def generate():
+            await asyncio.sleep(0)
+            raise RuntimeError("model error")
+
+        results = await asyncio.gather(flights.do("key", generate), flights.do("key", generate),
+                                       return_exceptions=True)
+        assert [str(result) for result in results] == ["model error"] * 2
+        assert flights.stats()["inFlight"] == 0
+        with pytest.raises(RuntimeError):
+            await flights.do("key", generate)
+
+    asyncio.run(test())
@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from teacher_provisioning import (
+    ProvisioningInputError, insert_teachers, parse_teacher_rows, summarize, validate_rows
+)
+
+
+class FakeUsers:
+    def __init__(self, write_errors=None):
+        self.write_errors = write_errors or []
+        self.inserted = []
+
+    async def insert_many(self, docs, ordered=True):
+        assert ordered is False
+        failed = {error["index"] for error in self.write_errors}
+        self.inserted.extend(doc for index, doc in enumerate(docs) if index not in failed)
+        if self.write_errors:
+            raise BulkWriteError({"writeErrors": self.write_errors})
+
+
+def teacher(email, **fields):
+    return {"email": email, "password": "parola", "name": "Ayşe", **fields}
+
+
+def test_parse_csv_with_bom():
+    body = "﻿email,password,name,className,ageDefault\na@okul.k12.tr,p,Ayşe,Papatyalar,48_60\n"
+    rows = parse_teacher_rows(body.encode("utf-8"), "text/csv")
+    assert rows == [{"email": "a@okul.k12.tr", "password": "p", "name": "Ayşe",
+                     "className": "Papatyalar", "ageDefault": "48_60"}]
+
+
+@pytest.mark.parametrize("data", [[teacher("a@okul.k12.tr")], {"teachers": [teacher("a@okul.k12.tr")]}])
+def test_parse_json_list_or_wrapper(data):
+    assert parse_teacher_rows(json.dumps(data).encode(), "application/json") == [teacher("a@okul.k12.tr")]
+
+
+@pytest.mark.parametrize("body", [b"\xff\xfe", b"not json", b'{"teachers": "a"}', b'["a@okul.k12.tr"]'])
+def test_parse_rejects_bad_uploads(body):
+    with pytest.raises(ProvisioningInputError):
+        parse_teacher_rows(body, "application/json")
+
+
+def test_validate_rows_reports_each_problem_by_row():
+    accepted, rejected = validate_rows([
+        teacher("a@okul.k12.tr", ageDefault="36_48"),
+        {"email": "b@okul.k12.tr"},
+        teacher("not-an-email"),
+        teacher("c@okul.k12.tr", ageDefault="7_8"),
+        teacher("a@okul.k12.tr"),
+    ])
+    assert [number for number, _ in accepted] == [1]
+    assert [(result["row"], result["status"]) for result in rejected] == [
+        (2, "invalid"), (3, "invalid"), (4, "invalid"), (5, "duplicate")
+    ]
+    assert rejected[0]["error"] == "Missing password, name"
+
+
+def test_insert_reports_existing_emails_per_row():
+    docs = [(1, {"_id": ObjectId(), "email": "a@okul.k12.tr"}),
+            (3, {"_id": ObjectId(), "email": "b@okul.k12.tr"}),
+            (4, {"_id": ObjectId(), "email": "c@okul.k12.tr"})]
+    users = FakeUsers([{"index": 1, "code": 11000, "errmsg": "duplicate key"},
+                       {"index": 2, "code": 121, "errmsg": "validation failed"}])
+    results = asyncio.run(insert_teachers(users, docs))
+    assert [(result["row"], result["status"]) for result in results] == [
+        (1, "created"), (3, "exists"), (4, "error")
+    ]
+    assert results[0]["id"] == str(docs[0][1]["_id"])
+    assert results[2]["error"] == "validation failed"
+    assert [doc["email"] for doc in users.inserted] == ["a@okul.k12.tr"]
+
+
+def test_insert_nothing_skips_the_database():
+    users = FakeUsers()
+    assert asyncio.run(insert_teachers(users, [])) == []
+    assert users.inserted == []
+
+
+def test_summarize_sorts_and_counts():
+    summary = summarize([{"row": 2, "status": "created"}, {"row": 1, "status": "invalid"},
+                         {"row": 3, "status": "created"}])
+    assert summary["total"] == 3
+    assert summary["counts"] == {"created": 2, "invalid": 1}
+    assert [result["row"] for result in summary["results"]] == [1, 2, 3]
@@ -0,0 +1,35 @@
+from turn_router import TurnRouter
+
+
+def test_greetings_and_empty_messages_are_answered_locally():
+    router = TurnRouter()
+    for message in ("", "Merhaba!", "İyi günler hocam", "selam 👋"):
+        assert router.route(message, []) == ["theme"]
+
+
+def test_any_content_goes_to_the_model():
+    router = TurnRouter()
+    for message in ("Su", "Ay", "Yarın için plan yap", "İstanbul"):
+        assert router.route(message, []) is None
+
+
+def test_short_replies_after_a_real_request_go_to_the_model():
+    router = TurnRouter()
+    history = [("user", "sonbahar temalı günlük plan"), ("assistant", '{"finalize": false}')]
+    for message in ("iyi", "hocam", "İyi"):
+        assert router.route(message, history) is None
+
+
+def test_greeting_after_a_greeting_is_still_local():
+    router = TurnRouter()
+    assert router.route("hocam", [("user", "merhaba"), ("assistant", "{}")]) == ["theme"]
+
+
+def test_disabled_router_sends_everything_to_the_model():
+    assert TurnRouter(enabled=False).route("merhaba", []) is None
+
+
+def test_follow_up_keeps_the_plan_type():
+    response = TurnRouter().follow_up(["theme"], "monthly", "48_60", "2025-10-01")
+    assert response["type"] == "monthly" and response["finalize"] is False
+    assert response["missingFields"] == ["theme"] and len(response["followUpQuestions"]) == 2